@@ -1,12 +1,96 @@
 # -*- coding: utf-8 -*-
 # -*- mode: python -*-
+import uuid
+from functools import lru_cache
+
 from django_filters import rest_framework as filters
+from django_filters.constants import EMPTY_VALUES
+from django_filters.utils import translate_validation
 
 from birds.models import Animal, Event, Sample
 
 
+def requested_filter_names(filterset_class, params) -> frozenset:
+    """Returns the names of the filters in filterset_class used by params.
+
+    Parameters like `date_after` are matched to the filter `date`. Parameters
+    that don't belong to any filter (e.g. `page` or `format`) are ignored.
+
+    """
+    return frozenset(
+        name
+        for name in filterset_class.base_filters
+        if any(param == name or param.startswith(f"{name}_") for param in params)
+    )
+
+
+@lru_cache(maxsize=128)
+def requested_filterset(filterset_class, names: frozenset):
+    """Returns a subclass of filterset_class with only the filters in names.
+
+    Filters that are not in the query have no effect, so dropping them gives
+    the same result without copying every declared filter for each request.
+    The cache is keyed on the filter names (see requested_filter_names()), so
+    unrelated query parameters don't create new classes.
+
+    """
+    filterset = type(filterset_class.__name__, (filterset_class,), {})
+    filterset.base_filters = {
+        name: f for name, f in filterset_class.base_filters.items() if name in names
+    }
+    return filterset
+
+
+class RequestedFilterBackend(filters.DjangoFilterBackend):
+    """Filter backend that only instantiates the filters used in the request.
+
+    The full filterset is still used to render the form in the browsable API.
+
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        filterset_class = self.get_filterset_class(view, queryset)
+        if filterset_class is None:
+            return queryset
+        names = requested_filter_names(filterset_class, request.query_params)
+        filterset_class = requested_filterset(filterset_class, names)
+        filterset = filterset_class(
+            **self.get_filterset_kwargs(request, queryset, view)
+        )
+        if not filterset.is_valid() and self.raise_exception:
+            raise translate_validation(filterset.errors)
+        return filterset.qs
+
+
+class UUIDPrefixFilter(filters.CharFilter):
+    """Case-insensitive match on the start of a UUID.
+
+    The prefix is converted to the range of UUIDs that start with it, so the
+    lookup can use the index on the field instead of casting every UUID to text.
+
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        prefix = value.strip().lower()
+        digits = prefix.replace("-", "")
+        try:
+            lower = uuid.UUID(digits.ljust(32, "0"))
+            upper = uuid.UUID(digits.ljust(32, "f"))
+        except ValueError:
+            return qs.none()
+        # dashes have to be in the same places as in the full UUID
+        if not str(lower).startswith(prefix):
+            return qs.none()
+        if self.distinct:
+            qs = qs.distinct()
+        lookup = f"{self.field_name}__range"
+        return self.get_method(qs)(**{lookup: (lower, upper)})
+
+
 class AnimalFilter(filters.FilterSet):
-    uuid = filters.CharFilter(field_name="uuid", lookup_expr="istartswith")
+    uuid = UUIDPrefixFilter(field_name="uuid")
     color = filters.CharFilter(field_name="band_color__name", lookup_expr="iexact")
     band = filters.NumberFilter(field_name="band_number", lookup_expr="exact")
     species = filters.CharFilter(field_name="species__code", lookup_expr="iexact")
@@ -16,11 +100,11 @@ class AnimalFilter(filters.FilterSet):
     reserved_by = filters.CharFilter(
         field_name="reserved_by__username", lookup_expr="iexact"
     )
-    parent = filters.CharFilter(field_name="parents__uuid", lookup_expr="istartswith")
-    child = filters.CharFilter(field_name="children__uuid", lookup_expr="istartswith")
+    parent = UUIDPrefixFilter(field_name="parents__uuid")
+    child = UUIDPrefixFilter(field_name="children__uuid")
 
     def is_alive(self, queryset, name, value):
-        return queryset.filter(alive__gt=0)
+        return queryset.alive()
 
     class Meta:
         model = Animal
@@ -28,7 +112,7 @@ class AnimalFilter(filters.FilterSet):
 
 
 class EventFilter(filters.FilterSet):
-    animal = filters.CharFilter(field_name="animal__uuid", lookup_expr="istartswith")
+    animal = UUIDPrefixFilter(field_name="animal__uuid")
     color = filters.CharFilter(
         field_name="animal__band_color__name", lookup_expr="iexact"
     )
@@ -52,14 +136,14 @@ class EventFilter(filters.FilterSet):
 
 class PairingFilter(filters.FilterSet):
     active = filters.BooleanFilter(field_name="active", method="is_active")
-    sire = filters.CharFilter(field_name="sire__uuid", lookup_expr="istartswith")
+    sire = UUIDPrefixFilter(field_name="sire__uuid")
     sire_color = filters.CharFilter(
         field_name="sire__band_color__name", lookup_expr="iexact"
     )
     sire_band = filters.NumberFilter(
         field_name="sire__band_number", lookup_expr="exact"
     )
-    dam = filters.CharFilter(field_name="dam__uuid", lookup_expr="istartswith")
+    dam = UUIDPrefixFilter(field_name="dam__uuid")
     dam_color = filters.CharFilter(
         field_name="dam__band_color__name", lookup_expr="iexact"
     )
@@ -71,7 +155,7 @@ class PairingFilter(filters.FilterSet):
 
 
 class SampleFilter(filters.FilterSet):
-    uuid = filters.CharFilter(field_name="uuid", lookup_expr="istartswith")
+    uuid = UUIDPrefixFilter(field_name="uuid")
     type = filters.CharFilter(field_name="type__name", lookup_expr="istartswith")
     location = filters.CharFilter(
         field_name="location__name", lookup_expr="istartswith"
@@ -89,7 +173,7 @@ class SampleFilter(filters.FilterSet):
     )
 
     def is_available(self, queryset, name, value):
-        return queryset.exclude(location__isnull=True)
+        return queryset.filter(location__isnull=not value)
 
     class Meta:
         model = Sample
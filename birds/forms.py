@@ -119,7 +119,7 @@ class BreedingCheckForm(forms.Form):
     # this should be active() only but it may be causing some weird and
     # difficult to replicate form validation errors
     pairing = forms.ModelChoiceField(
-        queryset=Pairing.objects.all(), widget=forms.HiddenInput()
+        queryset=Pairing.objects.with_related(), widget=forms.HiddenInput()
     )
     location = forms.ModelChoiceField(
         queryset=Location.objects.all(), widget=forms.HiddenInput()
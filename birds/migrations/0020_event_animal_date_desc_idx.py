@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-15 21:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('birds', '0019_location_description'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='event',
+            name='animal_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['animal', '-date', '-created'], include=('location', 'status'), name='event_animal_date_desc_idx'),
+        ),
+    ]
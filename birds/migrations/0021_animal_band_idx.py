@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-15 21:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('birds', '0020_event_animal_date_desc_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(condition=models.Q(('band_number__isnull', False)), fields=['band_color', 'band_number'], name='animal_band_idx'),
+        ),
+    ]
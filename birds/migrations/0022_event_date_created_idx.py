@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-15 21:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('birds', '0021_animal_band_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['-date', '-created'], name='event_date_created_idx'),
+        ),
+    ]
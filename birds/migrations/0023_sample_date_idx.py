@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-15 21:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('birds', '0022_event_date_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sample',
+            index=models.Index(fields=['-date'], name='sample_date_idx'),
+        ),
+    ]
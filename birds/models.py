@@ -4,18 +4,18 @@ from __future__ import unicode_literals
 
 import datetime
 import uuid
+from collections import defaultdict
 from functools import lru_cache
 from typing import Optional
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import connections, models
 from django.db.models import (
     Case,
     CheckConstraint,
     Count,
-    DateField,
     F,
     Max,
     Min,
@@ -25,7 +25,7 @@ from django.db.models import (
     Sum,
     When,
 )
-from django.db.models.functions import Cast, Now, Trunc, TruncDay
+from django.db.models.functions import Cast, Coalesce, Now, TruncDay
 from django.urls import reverse
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
@@ -57,6 +57,11 @@ def get_death_event_type():
     return Status.objects.get(name=DEATH_EVENT_NAME)
 
 
+@lru_cache
+def get_moved_event_type():
+    return Status.objects.get(name=MOVED_EVENT_NAME)
+
+
 def get_sentinel_user():
     return get_user_model().objects.get_or_create(username="deleted")[0]
 
@@ -212,6 +217,52 @@ class AnimalManager(models.Manager):
         animal.save()
         return animal
 
+    def bulk_create_from_parents(
+        self,
+        n: int,
+        *,
+        sire: "Animal",
+        dam: "Animal",
+        date: datetime.date,
+        status: Status,
+        entered_by: settings.AUTH_USER_MODEL,
+        location: Location,
+        description: Optional[str] = None,
+    ):
+        """Create n animals with the same parents and creation event using one
+        insert per table. Returns the list of new animals.
+
+        """
+        species = sire.species
+        if species != dam.species:
+            raise ValueError("sire and dam species do not match")
+        if sire.sex != Animal.Sex.MALE:
+            raise ValueError("sire must be a male")
+        if dam.sex != Animal.Sex.FEMALE:
+            raise ValueError("dam must be a female")
+        animals = self.bulk_create([self.model(species=species) for _ in range(n)])
+        Parent.objects.bulk_create(
+            [
+                Parent(child=animal, parent=parent)
+                for animal in animals
+                for parent in (sire, dam)
+            ]
+        )
+        Event.objects.bulk_create(
+            [
+                Event(
+                    animal=animal,
+                    date=date,
+                    status=status,
+                    location=location,
+                    entered_by=entered_by,
+                    description=description or "",
+                )
+                for animal in animals
+            ]
+        )
+        return animals
+
 
 class AnimalQuerySet(models.QuerySet):
     """Supports queries based on status that require joining on the event table"""
@@ -271,12 +322,18 @@ class AnimalQuerySet(models.QuerySet):
         )
 
     def with_child_counts(self):
-        # TODO fix me - very slow
-        return self.annotate(
-            n_children=Count(
-                "children", filter=Q(children__event__status=get_birth_event_type())
+        """Annotate the birds with the number of children that hatched (n_children)"""
+        # a correlated subquery keeps the count from multiplying the joins used
+        # by the other annotations
+        hatched = (
+            Parent.objects.filter(
+                parent=OuterRef("pk"), child__event__status__name=BIRTH_EVENT_NAME
             )
+            .values("parent")
+            .annotate(n=Count("child", distinct=True))
+            .values("n")
         )
+        return self.annotate(n_children=Coalesce(Subquery(hatched), 0))
 
     def with_annotations(self, on_date: Optional[datetime.date] = None):
         return self.with_dates(on_date).with_location(on_date)
@@ -306,6 +363,27 @@ class AnimalQuerySet(models.QuerySet):
             first_event_on__isnull=False, died_on__isnull=True
         )
 
+    def existing_between(self, since: datetime.date, until: datetime.date):
+        """Only birds that existed at any point between since and until (inclusive).
+
+        The birds are annotated with dates as of `until` (see with_dates()) and
+        with `removed_on`, the date of the first event that removed them.
+
+        """
+        return (
+            self.with_dates(until)
+            .annotate(
+                removed_on=Min(
+                    "event__date",
+                    filter=Q(event__status__removes=True, event__date__lte=until),
+                )
+            )
+            .filter(
+                Q(removed_on__isnull=True) | Q(removed_on__gt=since),
+                first_event_on__isnull=False,
+            )
+        )
+
     def ancestors_of(self, animal, generation: int = 1):
         """All ancestors of animal at specified generation"""
         key = "__".join(("children",) * generation)
@@ -318,6 +396,49 @@ class AnimalQuerySet(models.QuerySet):
         kwargs = {key: animal}
         return self.filter(**kwargs)
 
+    def ancestors_by_generation(self, animal, generations: int = 4):
+        """All ancestors of animal, as a list for each generation (parents first).
+
+        The pedigree is traversed with a single recursive query.
+
+        """
+        return self._by_generation(animal, generations, "child", "parent")
+
+    def descendents_by_generation(self, animal, generations: int = 4):
+        """All descendents of animal, as a list for each generation (children first).
+
+        The pedigree is traversed with a single recursive query.
+
+        """
+        return self._by_generation(animal, generations, "parent", "child")
+
+    def _by_generation(self, animal, generations: int, from_field: str, to_field: str):
+        conn = connections[self.db]
+        qn = conn.ops.quote_name
+        table = qn(Parent._meta.db_table)
+        from_col = qn(Parent._meta.get_field(from_field).column)
+        to_col = qn(Parent._meta.get_field(to_field).column)
+        sql = (
+            f"WITH RECURSIVE lineage(uuid, generation) AS ("
+            f"SELECT {to_col}, 1 FROM {table} WHERE {from_col} = %s "
+            f"UNION ALL "
+            f"SELECT p.{to_col}, l.generation + 1 FROM lineage l "
+            f"JOIN {table} p ON p.{from_col} = l.uuid WHERE l.generation < %s"
+            f") SELECT DISTINCT uuid, generation FROM lineage"
+        )
+        pk = Animal._meta.pk
+        lineage = defaultdict(list)
+        with conn.cursor() as cursor:
+            cursor.execute(sql, [pk.get_db_prep_value(animal.pk, conn), generations])
+            for value, generation in cursor.fetchall():
+                lineage[pk.to_python(value)].append(generation)
+        # an animal may appear in more than one generation if there is inbreeding
+        result = [[] for _ in range(generations)]
+        for related in self.filter(pk__in=list(lineage)):
+            for generation in lineage[related.pk]:
+                result[generation - 1].append(related)
+        return result
+
 
 class Parent(models.Model):
     id = models.AutoField(primary_key=True)
@@ -385,13 +506,25 @@ class Animal(models.Model):
     def __str__(self):
         return self.name
 
+    def parents_by_sex(self):
+        """Returns (sire, dam), with None for any parent that is not known"""
+        # partition the parents in python in a single pass to avoid hitting
+        # the database again if parents were prefetched
+        sire = dam = None
+        for parent in self.parents.all():
+            if sire is None and parent.sex == Animal.Sex.MALE:
+                sire = parent
+            elif dam is None and parent.sex == Animal.Sex.FEMALE:
+                dam = parent
+            if sire is not None and dam is not None:
+                break
+        return sire, dam
+
     def sire(self):
-        # find the male parent in python to avoid hitting the database again if
-        # parents were prefetched
-        return next((p for p in self.parents.all() if p.sex == Animal.Sex.MALE), None)
+        return self.parents_by_sex()[0]
 
     def dam(self):
-        return next((p for p in self.parents.all() if p.sex == Animal.Sex.FEMALE), None)
+        return self.parents_by_sex()[1]
 
     def sexed(self):
         return self.sex != Animal.Sex.UNKNOWN_SEX
@@ -527,11 +660,9 @@ class Animal(models.Model):
         )
         if events["born_on"] is None:
             return None
+        sire, dam = self.parents_by_sex()
         return (
-            Pairing.objects.filter(
-                sire=self.sire(),
-                dam=self.dam(),
-            )
+            Pairing.objects.filter(sire=sire, dam=dam)
             .exclude(began_on__gte=events["born_on"])
             .exclude(ended_on__lte=events["born_on"])
             .first()
@@ -592,6 +723,15 @@ class Animal(models.Model):
 
     class Meta:
         ordering = ["band_color", "band_number"]
+        indexes = [
+            # used to check whether a band is already in use. Not unique because
+            # bands may be reused.
+            models.Index(
+                fields=["band_color", "band_number"],
+                condition=Q(band_number__isnull=False),
+                name="animal_band_idx",
+            ),
+        ]
 
 
 class EventQuerySet(models.QuerySet):
@@ -616,9 +756,9 @@ class EventQuerySet(models.QuerySet):
         if date is None:
             date = datetime.date.today()
         month = datetime.date(year=date.year, month=date.month, day=1)
-        return self.annotate(
-            month=Trunc("date", "month", output_field=DateField())
-        ).filter(month=month)
+        next_month = (month + datetime.timedelta(days=32)).replace(day=1)
+        # a range (rather than truncating the date) lets the database use an index
+        return self.filter(date__gte=month, date__lt=next_month)
 
     def count_by_status(self):
         return self.values("status__name").annotate(count=Count("id"))
@@ -659,8 +799,18 @@ class Event(models.Model):
     class Meta:
         ordering = ["-date", "-created"]
         indexes = [
+            # matches the default ordering, so pages of events can be read
+            # from the index without sorting
+            models.Index(fields=["-date", "-created"], name="event_date_created_idx"),
             models.Index(fields=["animal", "status"], name="animal_status_idx"),
-            models.Index(fields=["animal", "date"], name="animal_date_idx"),
+            # matches the ordering used to find the most recent event for each
+            # animal; location and status are included for index-only scans, so
+            # this also serves has_location() and with_location()
+            models.Index(
+                fields=["animal", "-date", "-created"],
+                include=["location", "status"],
+                name="event_animal_date_desc_idx",
+            ),
         ]
         get_latest_by = ["date", "created"]
 
@@ -677,7 +827,7 @@ class PairingManager(models.Manager):
         location: Location,
     ):
         """Create a new pairing and add events to the sire and dam"""
-        status = Status.objects.get(name=MOVED_EVENT_NAME)
+        status = get_moved_event_type()
         pairing = self.create(
             sire=sire, dam=dam, began_on=began_on, ended_on=None, purpose=purpose
         )
@@ -890,6 +1040,31 @@ class Pairing(models.Model):
             **animal_properties,
         )
 
+    def create_eggs(
+        self,
+        n: int,
+        date: datetime.date,
+        *,
+        entered_by: settings.AUTH_USER_MODEL,
+        location: Optional[Location] = None,
+        description: Optional[str] = None,
+    ):
+        """Create n eggs and associated events for the pair in bulk"""
+        if date < self.began_on:
+            raise ValueError(_("Date must be on or after start of pairing"))
+        if self.ended_on is not None and date > self.ended_on:
+            raise ValueError(_("Date must be on or before end of pairing"))
+        return Animal.objects.bulk_create_from_parents(
+            n,
+            sire=self.sire,
+            dam=self.dam,
+            date=date,
+            status=get_unborn_creation_event_type(),
+            entered_by=entered_by,
+            location=location,
+            description=description,
+        )
+
     def close(
         self,
         ended_on: datetime.date,
@@ -912,8 +1087,8 @@ class Pairing(models.Model):
         self.ended_on = ended_on
         self.comment = comment or ""
         self.save()  # will throw integrity error if ended_on <= began_on
-        status = Status.objects.get(name=MOVED_EVENT_NAME)
         if location is not None:
+            status = get_moved_event_type()
             Event.objects.create(
                 animal=self.sire,
                 date=ended_on,
@@ -961,6 +1136,11 @@ class Pairing(models.Model):
         ]
 
 
+class NestCheckQuerySet(models.QuerySet):
+    def with_related(self):
+        return self.select_related("entered_by")
+
+
 class NestCheck(models.Model):
     id = models.AutoField(primary_key=True)
     entered_by = models.ForeignKey(
@@ -968,6 +1148,7 @@ class NestCheck(models.Model):
     )
     datetime = models.DateTimeField()
     comments = models.TextField(blank=True)
+    objects = NestCheckQuerySet.as_manager()
 
     def __str__(self):
         return "{} at {}".format(self.entered_by, self.datetime)
@@ -1038,3 +1219,7 @@ class Sample(models.Model):
 
     class Meta:
         ordering = ["animal", "type"]
+        indexes = [
+            # the sample list shows the most recent samples first
+            models.Index(fields=["-date"], name="sample_date_idx"),
+        ]
@@ -8,9 +8,11 @@ from rest_framework import status
 from rest_framework.test import APITestCase
 
 from birds import models
+from birds.filters import requested_filterset
 from birds.models import (
     Animal,
     Location,
+    Plumage,
     Species,
 )
 
@@ -51,6 +53,65 @@ class ApiViewTests(APITestCase):
         self.assertEqual(len(response.data), self.n_birds)
         self.assertEqual({bird["uuid"] for bird in response.data}, self.uuids)
 
+    def test_bird_list_view_loads_related_objects(self):
+        plumage = Plumage.objects.first()
+        Animal.objects.update(plumage=plumage)
+        # one query for the animals and one for their parents
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("birds:animals_api"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({bird["plumage"] for bird in response.data}, {plumage.name})
+        children = [bird for bird in response.data if bird["sire"] is not None]
+        self.assertEqual(len(children), len(self.children))
+        for bird in children:
+            self.assertEqual(bird["sire"], self.sire.uuid)
+            self.assertEqual(bird["dam"], self.dam.uuid)
+
+    def test_bird_list_view_filters(self):
+        response = self.client.get(reverse("birds:animals_api"), {"sex": "F"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([bird["uuid"] for bird in response.data], [str(self.dam.uuid)])
+        response = self.client.get(
+            reverse("birds:animals_api"), {"sex": "M", "living": True}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {bird["uuid"] for bird in response.data},
+            {str(child.uuid) for child in self.children},
+        )
+        response = self.client.get(reverse("birds:animals_api"), {"band": "x"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bird_list_view_filterset_cache_ignores_other_params(self):
+        requested_filterset.cache_clear()
+        for params in (
+            {"sex": "F"},
+            {"sex": "M", "format": "json"},
+            {"sex": "F", "x": 1},
+        ):
+            response = self.client.get(reverse("birds:animals_api"), params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(requested_filterset.cache_info().currsize, 1)
+
+    def test_bird_list_view_filters_by_uuid_prefix(self):
+        uuid = str(self.dam.uuid)
+        for prefix in (uuid[:4], uuid[:10].upper(), uuid):
+            response = self.client.get(reverse("birds:animals_api"), {"uuid": prefix})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn(uuid, [bird["uuid"] for bird in response.data])
+            self.assertTrue(
+                all(bird["uuid"].startswith(prefix.lower()) for bird in response.data)
+            )
+        for prefix in (uuid[:4] + "-", "xyz", uuid + "0"):
+            response = self.client.get(reverse("birds:animals_api"), {"uuid": prefix})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data), 0)
+        response = self.client.get(reverse("birds:animals_api"), {"parent": uuid[:8]})
+        self.assertEqual(
+            {bird["uuid"] for bird in response.data},
+            {str(child.uuid) for child in self.children},
+        )
+
     def test_bird_detail_view(self):
         for child in self.children:
             response = self.client.get(reverse("birds:animal_api", args=[child.uuid]))
@@ -88,7 +149,11 @@ class ApiViewTests(APITestCase):
             )
 
     def test_bird_children_list_view(self):
-        response = self.client.get(reverse("birds:children_api", args=[self.sire.uuid]))
+        # look up the parent, then load the children and their parents
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse("birds:children_api", args=[self.sire.uuid])
+            )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 2)
         self.assertEqual(
@@ -122,8 +187,20 @@ class ApiViewTests(APITestCase):
                 },
             )
 
+    def test_event_list_view_filters(self):
+        response = self.client.get(
+            reverse("birds:events_api"), {"date__year": self.birthday.year}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        response = self.client.get(reverse("birds:events_api"), {"status": "died"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 0)
+
     def test_pedigree_view(self):
-        response = self.client.get(reverse("birds:pedigree_api"))
+        # count, animals, and parents
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("birds:pedigree_api"))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # pedigree will include parents even though they aren't alive
         self.assertEqual(len(response.data), self.n_birds)
@@ -131,4 +208,15 @@ class ApiViewTests(APITestCase):
             {bird["uuid"] for bird in response.data},
             self.uuids,
         )
-        # needs more testing
+        for bird in response.data:
+            if bird["uuid"] in {str(child.uuid) for child in self.children}:
+                self.assertEqual(bird["sire"], self.sire.name)
+                self.assertEqual(bird["dam"], self.dam.name)
+        # animals that are not alive and have no children are excluded unless
+        # restrict is false
+        loner = Animal.objects.create(species=self.species)
+        response = self.client.get(reverse("birds:pedigree_api"))
+        self.assertNotIn(str(loner.uuid), {bird["uuid"] for bird in response.data})
+        response = self.client.get(reverse("birds:pedigree_api"), {"restrict": "false"})
+        self.assertEqual(len(response.data), self.n_birds + 1)
+        self.assertIn(str(loner.uuid), {bird["uuid"] for bird in response.data})
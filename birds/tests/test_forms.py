@@ -29,6 +29,8 @@ from birds.models import (
 
 warnings.filterwarnings("error")
 
+BreedingCheckFormSet = formset_factory(BreedingCheckForm, extra=0)
+
 
 def today() -> datetime.date:
     return datetime.date.today()
@@ -38,33 +40,65 @@ def dt_days(days: int) -> datetime.timedelta:
     return datetime.timedelta(days=days)
 
 
+def make_animals(*animal_properties, species, date, status, entered_by, location):
+    """Create animals with an acquisition event using bulk inserts.
+
+    Use this for fixtures that do not depend on side effects of
+    Animal.objects.create_with_event().
+
+    """
+    animals = Animal.objects.bulk_create(
+        [Animal(species=species, **properties) for properties in animal_properties]
+    )
+    Event.objects.bulk_create(
+        [
+            Event(
+                animal=animal,
+                date=date,
+                status=status,
+                entered_by=entered_by,
+                location=location,
+            )
+            for animal in animals
+        ]
+    )
+    return animals
+
+
 class SexFormTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.status, _ = Status.objects.get_or_create(name=models.NOTE_EVENT_NAME)
+        cls.user = models.get_sentinel_user()
+
     def test_without_note_status(self):
-        user = models.get_sentinel_user()
-        form = SexForm({"date": today(), "sex": "M", "entered_by": user})
+        self.status.delete()
+        form = SexForm({"date": today(), "sex": "M", "entered_by": self.user})
         self.assertFalse(form.is_valid())
 
     def test_with_note_status(self):
-        _ = Status.objects.get_or_create(name=models.NOTE_EVENT_NAME)
-        user = models.get_sentinel_user()
-        form = SexForm({"date": today(), "sex": "M", "entered_by": user})
+        form = SexForm({"date": today(), "sex": "M", "entered_by": self.user})
         self.assertTrue(form.is_valid())
 
 
 class ReservationFormTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.status, _ = Status.objects.get_or_create(
+            name=models.RESERVATION_EVENT_NAME
+        )
+        cls.user = models.get_sentinel_user()
+
     def test_without_reservation_status(self):
-        user = models.get_sentinel_user()
-        form = ReservationForm({"date": today(), "entered_by": user})
+        self.status.delete()
+        form = ReservationForm({"date": today(), "entered_by": self.user})
         self.assertFalse(form.is_valid())
 
     def test_with_reservation_status(self):
-        _ = Status.objects.get_or_create(name=models.RESERVATION_EVENT_NAME)
-        user = models.get_sentinel_user()
-        form = ReservationForm({"date": today(), "entered_by": user})
+        form = ReservationForm({"date": today(), "entered_by": self.user})
         self.assertTrue(form.is_valid())
 
     def test_without_user(self):
-        _ = Status.objects.get_or_create(name=models.RESERVATION_EVENT_NAME)
         form = ReservationForm({"date": today()})
         self.assertTrue(form.is_valid())
 
@@ -85,49 +119,45 @@ class NewBandFormTest(TestCase):
             plumage=cls.plumage,
             band_number=20,
         )
+        cls.status, _ = Status.objects.get_or_create(name=models.BANDED_EVENT_NAME)
+        cls.user = models.get_sentinel_user()
 
     def test_without_banded_status(self):
-        user = models.get_sentinel_user()
+        self.status.delete()
         form = NewBandForm(
             {
                 "banding_date": today(),
                 "band_number": 10,
                 "sex": "M",
-                "user": user,
+                "user": self.user,
             }
         )
         self.assertFalse(form.is_valid())
 
     def test_with_banded_status(self):
-        _ = Status.objects.get_or_create(name=models.BANDED_EVENT_NAME)
-        user = models.get_sentinel_user()
         form = NewBandForm(
             {
                 "banding_date": today(),
                 "band_number": 10,
                 "sex": "M",
-                "user": user,
+                "user": self.user,
             }
         )
         self.assertTrue(form.is_valid())
 
     def test_band_already_exists(self):
-        _ = Status.objects.get_or_create(name=models.BANDED_EVENT_NAME)
-        user = models.get_sentinel_user()
         form = NewBandForm(
             {
                 "banding_date": today(),
                 "band_color": self.color,
                 "band_number": 20,
                 "sex": "M",
-                "user": user,
+                "user": self.user,
             }
         )
         self.assertFalse(form.is_valid())
 
     def test_with_all_fields(self):
-        _ = Status.objects.get_or_create(name=models.BANDED_EVENT_NAME)
-        user = models.get_sentinel_user()
         form = NewBandForm(
             {
                 "banding_date": today(),
@@ -136,7 +166,7 @@ class NewBandFormTest(TestCase):
                 "location": self.location,
                 "band_number": 40,
                 "sex": "F",
-                "user": user,
+                "user": self.user,
             }
         )
         self.assertTrue(form.is_valid())
@@ -147,14 +177,14 @@ class NewAnimalFormTest(TestCase):
 
     @classmethod
     def setUpTestData(cls):
-        status = models.get_birth_event_type()
+        cls.birth_status = models.get_birth_event_type()
         birthday = today() - dt_days(365)
         cls.user = models.get_sentinel_user()
         cls.location = Location.objects.get(pk=2)
         cls.species = Species.objects.get(pk=1)
         cls.sire = Animal.objects.create_with_event(
             species=cls.species,
-            status=status,
+            status=cls.birth_status,
             date=birthday,
             entered_by=cls.user,
             location=cls.location,
@@ -163,7 +193,7 @@ class NewAnimalFormTest(TestCase):
         )
         cls.dam = Animal.objects.create_with_event(
             species=cls.species,
-            status=status,
+            status=cls.birth_status,
             date=birthday,
             entered_by=cls.user,
             location=cls.location,
@@ -205,7 +235,7 @@ class NewAnimalFormTest(TestCase):
 
     def test_add_from_parents(self):
         acq_on = today() - dt_days(10)
-        acq_status = models.get_birth_event_type()
+        acq_status = self.birth_status
         form = NewAnimalForm(
             {
                 "acq_status": acq_status,
@@ -223,7 +253,7 @@ class NewAnimalFormTest(TestCase):
 
     def test_add_from_one_parent(self):
         acq_on = today() - dt_days(10)
-        acq_status = models.get_birth_event_type()
+        acq_status = self.birth_status
         form = NewAnimalForm(
             {
                 "acq_status": acq_status,
@@ -240,7 +270,7 @@ class NewAnimalFormTest(TestCase):
 
     def test_add_from_mismatched_parent(self):
         acq_on = today() - dt_days(10)
-        acq_status = models.get_birth_event_type()
+        acq_status = self.birth_status
         species = Species.objects.create(
             common_name="eurasian magpie", genus="pica", species="pica", code="EUMA"
         )
@@ -336,7 +366,12 @@ class NewPairingFormTest(TestCase):
         self.assertFalse(form.is_valid())
 
     def test_not_alive(self):
-        dead_sire = Animal.objects.create(species=self.species, sex=Animal.Sex.MALE)
+        dead_sire, dead_dam = Animal.objects.bulk_create(
+            [
+                Animal(species=self.species, sex=Animal.Sex.MALE),
+                Animal(species=self.species, sex=Animal.Sex.FEMALE),
+            ]
+        )
         form = NewPairingForm(
             {
                 "sire": dead_sire,
@@ -346,7 +381,6 @@ class NewPairingFormTest(TestCase):
             }
         )
         self.assertFalse(form.is_valid())
-        dead_dam = Animal.objects.create(species=self.species, sex=Animal.Sex.FEMALE)
         form = NewPairingForm(
             {
                 "sire": self.sire,
@@ -358,14 +392,14 @@ class NewPairingFormTest(TestCase):
         self.assertFalse(form.is_valid())
 
     def test_not_adults(self):
-        invalid_sire = Animal.objects.create_with_event(
+        invalid_sire, invalid_dam = make_animals(
+            {"sex": Animal.Sex.MALE, "band_number": 1},
+            {"sex": Animal.Sex.FEMALE, "band_number": 1},
             species=self.species,
             status=self.status,
             date=today() - dt_days(5),
             entered_by=self.user,
             location=self.location,
-            sex=Animal.Sex.MALE,
-            band_number=1,
         )
         form = NewPairingForm(
             {
@@ -376,15 +410,6 @@ class NewPairingFormTest(TestCase):
             }
         )
         self.assertFalse(form.is_valid())
-        invalid_dam = Animal.objects.create_with_event(
-            species=self.species,
-            status=self.status,
-            date=today() - dt_days(5),
-            entered_by=self.user,
-            location=self.location,
-            sex=Animal.Sex.FEMALE,
-            band_number=1,
-        )
         form = NewPairingForm(
             {
                 "sire": self.sire,
@@ -435,13 +460,13 @@ class BreedingCheckFormTest(TestCase):
     @classmethod
     def setUpTestData(cls):
         birthday = today() - dt_days(365)
-        status = models.get_birth_event_type()
+        cls.birth_status = models.get_birth_event_type()
         cls.user = models.get_sentinel_user()
         location = Location.objects.get(pk=1)
         species = Species.objects.get(pk=1)
         cls.sire = Animal.objects.create_with_event(
             species=species,
-            status=status,
+            status=cls.birth_status,
             date=birthday,
             entered_by=cls.user,
             location=location,
@@ -450,7 +475,7 @@ class BreedingCheckFormTest(TestCase):
         )
         cls.dam = Animal.objects.create_with_event(
             species=species,
-            status=status,
+            status=cls.birth_status,
             date=birthday,
             entered_by=cls.user,
             location=location,
@@ -473,7 +498,7 @@ class BreedingCheckFormTest(TestCase):
         _event = Event.objects.create(
             animal=child,
             date=today(),
-            status=models.get_birth_event_type(),
+            status=self.birth_status,
             entered_by=self.user,
         )
         form = BreedingCheckForm(
@@ -550,7 +575,7 @@ class BreedingCheckFormTest(TestCase):
         _event = Event.objects.create(
             animal=child,
             date=today() - dt_days(4),
-            status=models.get_birth_event_type(),
+            status=self.birth_status,
             entered_by=self.user,
         )
         _event = Event.objects.create(
@@ -593,7 +618,7 @@ class BreedingCheckFormTest(TestCase):
         _event = Event.objects.create(
             animal=chick,
             date=today(),
-            status=models.get_birth_event_type(),
+            status=self.birth_status,
             entered_by=self.user,
         )
         form = BreedingCheckForm({"pairing": self.pairing, "eggs": 0, "chicks": 0})
@@ -601,7 +626,6 @@ class BreedingCheckFormTest(TestCase):
 
     def test_nest_check_formset(self):
         _egg = self.pairing.create_egg(today() - dt_days(5), entered_by=self.user)
-        BreedingCheckFormSet = formset_factory(BreedingCheckForm, extra=0)
         formset = BreedingCheckFormSet(
             {
                 "form-TOTAL_FORMS": 1,
@@ -254,6 +254,57 @@ class AnimalModelTests(TestCase):
         self.assertNotIn(bird, Animal.objects.unhatched().alive())
         self.assertNotIn(bird, Animal.objects.alive().unhatched())
 
+    def test_existing_between(self):
+        species = Species.objects.get(pk=1)
+        bird = Animal.objects.create(species=species)
+        user = models.get_sentinel_user()
+        born_on = today() - dt_days(10)
+        died_on = today() - dt_days(5)
+        Event.objects.create(
+            animal=bird,
+            status=models.get_birth_event_type(),
+            date=born_on,
+            entered_by=user,
+        )
+        Event.objects.create(
+            animal=bird,
+            status=Status.objects.get(name="died"),
+            date=died_on,
+            entered_by=user,
+        )
+        self.assertIn(bird, Animal.objects.existing_between(born_on, born_on))
+        self.assertIn(
+            bird, Animal.objects.existing_between(born_on - dt_days(3), today())
+        )
+        self.assertIn(
+            bird, Animal.objects.existing_between(died_on - dt_days(1), today())
+        )
+        self.assertNotIn(
+            bird,
+            Animal.objects.existing_between(born_on - dt_days(3), born_on - dt_days(1)),
+        )
+        self.assertNotIn(bird, Animal.objects.existing_between(died_on, today()))
+        annotated_bird = Animal.objects.existing_between(born_on, today()).get(
+            pk=bird.pk
+        )
+        self.assertEqual(annotated_bird.born_on, born_on)
+        self.assertEqual(annotated_bird.removed_on, died_on)
+        # removal after the end of the range is not visible
+        annotated_bird = Animal.objects.existing_between(born_on, born_on).get(
+            pk=bird.pk
+        )
+        self.assertIs(annotated_bird.removed_on, None)
+        # like existing(), eggs are included
+        egg = Animal.objects.create(species=species)
+        Event.objects.create(
+            animal=egg,
+            status=models.get_unborn_creation_event_type(),
+            date=born_on,
+            entered_by=user,
+        )
+        self.assertIn(egg, Animal.objects.existing_between(born_on, today()))
+        self.assertNotIn(egg, Animal.objects.alive())
+
     def test_status_of_egg(self):
         species = Species.objects.get(pk=1)
         egg = Animal.objects.create(species=species)
@@ -544,6 +595,8 @@ class ParentModelTests(TestCase):
         child = make_child(sire, dam)
         self.assertEqual(child.sire(), sire)
         self.assertEqual(child.dam(), dam)
+        self.assertEqual(child.parents_by_sex(), (sire, dam))
+        self.assertEqual(sire.parents_by_sex(), (None, None))
         self.assertTrue(sire.children.contains(child))
         self.assertTrue(dam.children.contains(child))
         self.assertEqual(
@@ -702,6 +755,18 @@ class ParentModelTests(TestCase):
         grandparents = Animal.objects.ancestors_of(grandson, generation=2)
         self.assertCountEqual(grandparents, [sire, dam])
         self.assertCountEqual(grandparents.alive(), [sire])
+        # all generations at once
+        descendents = Animal.objects.descendents_by_generation(sire, generations=3)
+        self.assertEqual(len(descendents), 3)
+        self.assertCountEqual(descendents[0], [son])
+        self.assertCountEqual(
+            descendents[1], [grandson, granddaughter_1, granddaughter_2]
+        )
+        self.assertEqual(descendents[2], [])
+        ancestors = Animal.objects.alive().ancestors_by_generation(grandson)
+        self.assertEqual(len(ancestors), 4)
+        self.assertCountEqual(ancestors[0], [son, wife])
+        self.assertCountEqual(ancestors[1], [sire])
 
 
 class EventModelTests(TestCase):
@@ -806,6 +871,27 @@ class EventModelTests(TestCase):
         )
         self.assertCountEqual(Event.objects.in_month(month), [event_2])
 
+    def test_month_filter_at_end_of_year(self):
+        species = Species.objects.get(pk=1)
+        bird = Animal.objects.create(species=species)
+        status = Status.objects.get(name="note")
+        user = models.get_sentinel_user()
+        event_1 = Event.objects.create(
+            animal=bird,
+            status=status,
+            date=datetime.date(2023, 12, 31),
+            entered_by=user,
+        )
+        event_2 = Event.objects.create(
+            animal=bird, status=status, date=datetime.date(2024, 1, 1), entered_by=user
+        )
+        self.assertCountEqual(
+            Event.objects.in_month(datetime.date(2023, 12, 15)), [event_1]
+        )
+        self.assertCountEqual(
+            Event.objects.in_month(datetime.date(2024, 1, 31)), [event_2]
+        )
+
     def test_event_counts(self):
         species = Species.objects.get(pk=1)
         bird = Animal.objects.create(species=species)
@@ -856,6 +942,7 @@ class PairingModelTests(TestCase):
         dam_events = self.dam.event_set.all()
         self.assertEqual(dam_events.count(), 1)
         self.assertEqual(dam_events.first().date, date)
+        self.assertEqual(dam_events.first().status.name, models.MOVED_EVENT_NAME)
 
     def test_create_pairing_with_invalid_sexes(self):
         pairing = Pairing(
@@ -1032,6 +1119,61 @@ class PairingModelTests(TestCase):
         self.assertEqual(pairing_2.other_pairings().count(), 0)
         self.assertCountEqual(pairing_3.other_pairings(), [pairing_1])
 
+    def test_create_eggs_in_bulk(self):
+        user = models.get_sentinel_user()
+        location = Location.objects.get(pk=1)
+        pairing = Pairing.objects.create(
+            sire=self.sire, dam=self.dam, began_on=today() - dt_days(10)
+        )
+        # one insert each for the animals, parents, and events
+        with self.assertNumQueries(3):
+            eggs = pairing.create_eggs(3, today(), entered_by=user, location=location)
+        self.assertCountEqual(pairing.eggs(), eggs)
+        for egg in pairing.eggs().with_dates():
+            self.assertEqual(egg.sire(), self.sire)
+            self.assertEqual(egg.dam(), self.dam)
+            self.assertEqual(egg.age_group(), models.UNBORN_ANIMAL_NAME)
+            self.assertEqual(egg.first_event_on, today())
+            self.assertEqual(egg.event_set.get().location, location)
+
+    def test_create_eggs_checks_dates_and_parents(self):
+        user = models.get_sentinel_user()
+        pairing = Pairing.objects.create(
+            sire=self.sire,
+            dam=self.dam,
+            began_on=today() - dt_days(10),
+            ended_on=today() - dt_days(5),
+        )
+        with self.assertRaises(ValueError):
+            pairing.create_eggs(1, today() - dt_days(11), entered_by=user)
+        with self.assertRaises(ValueError):
+            pairing.create_eggs(1, today(), entered_by=user)
+        other_species = Species.objects.create(
+            common_name="other finch", genus="other", species="finch", code="otfi"
+        )
+        dam = Animal.objects.create(species=other_species, sex=Animal.Sex.FEMALE)
+        with self.assertRaises(ValueError):
+            Animal.objects.bulk_create_from_parents(
+                1,
+                sire=self.sire,
+                dam=dam,
+                date=today(),
+                status=models.get_unborn_creation_event_type(),
+                entered_by=user,
+                location=None,
+            )
+        with self.assertRaises(ValueError):
+            Animal.objects.bulk_create_from_parents(
+                1,
+                sire=self.dam,
+                dam=self.sire,
+                date=today(),
+                status=models.get_unborn_creation_event_type(),
+                entered_by=user,
+                location=None,
+            )
+        self.assertEqual(Animal.objects.count(), 3)
+
     def test_pairing_egg_list(self):
         pairing_began_on = today() - dt_days(10)
         pairing_ended_on = today()
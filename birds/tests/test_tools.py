@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
 # -*- mode: python -*-
 import datetime
+from collections import Counter, defaultdict
 
 from django.test import TestCase
 
 from birds import models, tools
 from birds.models import (
+    ADULT_ANIMAL_NAME,
     Animal,
     Event,
     Location,
@@ -15,46 +17,167 @@ from birds.models import (
 )
 
 
-class TabulateNestTest(TestCase):
+class SortAndGroupTest(TestCase):
     fixtures = ["bird_colony_starter_kit"]
 
     @classmethod
     def setUpTestData(cls):
-        birthday = datetime.date.today() - datetime.timedelta(days=365)
-        status = models.get_birth_event_type()
         user = models.get_sentinel_user()
-        location = Location.objects.get(pk=1)
+        status = models.get_birth_event_type()
         species = Species.objects.get(pk=1)
+        placements = [
+            (
+                Animal(species=species, band_number=band_number + location.pk * 10),
+                location,
+            )
+            for location in Location.objects.all()
+            for band_number in (1, 2)
+        ]
+        Animal.objects.bulk_create([animal for animal, _ in placements])
+        Event.objects.bulk_create(
+            [
+                Event(
+                    animal=animal,
+                    date=datetime.date.today(),
+                    status=status,
+                    entered_by=user,
+                    location=location,
+                )
+                for animal, location in placements
+            ]
+        )
+
+    def test_sort_and_group_in_python(self):
+        qs = Event.objects.all()
+        groups = {
+            location_id: len(list(events))
+            for location_id, events in tools.sort_and_group(
+                qs, key=lambda event: event.location_id
+            )
+        }
+        self.assertEqual(groups, {1: 2, 2: 2})
+
+    def test_sort_and_group_in_database(self):
+        qs = Event.objects.all()
+        groups = {
+            location_id: len(list(events))
+            for location_id, events in tools.sort_and_group(
+                qs, key=lambda event: event.location_id, order_by=("location_id",)
+            )
+        }
+        self.assertEqual(groups, {1: 2, 2: 2})
+
+    def test_sort_and_group_by_attribute_name(self):
+        qs = Event.objects.all()
+        groups = {
+            location_id: len(list(events))
+            for location_id, events in tools.sort_and_group(qs, key="location_id")
+        }
+        self.assertEqual(groups, {1: 2, 2: 2})
+
+
+class FindFirstTest(TestCase):
+    fixtures = ["bird_colony_starter_kit"]
+
+    def test_find_first_with_predicate(self):
+        self.assertEqual(tools.find_first(range(10), lambda x: x > 4), 5)
+        self.assertIsNone(tools.find_first(range(10), lambda x: x > 10))
+
+    def test_find_first_with_filters(self):
+        qs = Location.objects.order_by("name")
+        nest = Location.objects.get(pk=2)
+        with self.assertNumQueries(1):
+            self.assertEqual(tools.find_first(qs, nest=True), nest)
+        self.assertIsNone(tools.find_first(qs, name="no such place"))
+
+    def test_find_first_filters_require_queryset(self):
+        with self.assertRaises(TypeError):
+            _ = tools.find_first(range(10), nest=True)
+
+
+def tabulate_nests_by_day(since: datetime.date, until: datetime.date):
+    """Reference implementation of tools.tabulate_locations() that queries the
+    database for each day and each nest. Too slow for the views, but simple
+    enough to check the faster version against.
+
+    """
+    if since > until:
+        raise ValueError("until must be after since")
+    n_days = (until - since).days + 1
+    dates = [since + datetime.timedelta(days=x) for x in range(n_days)]
+    data = []
+    for nest in Location.objects.filter(nest=True).order_by("name"):
+        days = []
+        for date in dates:
+            by_group = defaultdict(list)
+            counts = Counter()
+            birds = (
+                nest.birds(date)
+                .existing(date)
+                .with_dates(date)
+                .select_related("species", "band_color")
+                .prefetch_related("species__age_set")
+                .order_by("band_color", "band_number")
+            )
+            for bird in birds:
+                age_group = bird.age_group(date)
+                by_group[age_group].append(bird)
+                if age_group is not None and age_group != ADULT_ANIMAL_NAME:
+                    counts[age_group] += 1
+            days.append({"animals": dict(by_group), "counts": dict(counts)})
+        data.append({"location": nest, "days": days})
+    return dates, data
+
+
+class BaseNestTest(TestCase):
+    """Base class for tests that need a sire and dam to put in the nest"""
+
+    fixtures = ["bird_colony_starter_kit"]
+
+    @classmethod
+    def setUpTestData(cls):
+        birthday = datetime.date.today() - datetime.timedelta(days=365)
+        status = models.get_birth_event_type()
+        cls.user = models.get_sentinel_user()
+        cls.location = Location.objects.get(pk=1)
+        cls.species = Species.objects.get(pk=1)
         cls.sire = Animal.objects.create_with_event(
-            species=species,
+            species=cls.species,
             status=status,
             date=birthday,
-            entered_by=user,
-            location=location,
+            entered_by=cls.user,
+            location=cls.location,
             sex=Animal.Sex.MALE,
             band_number=1,
         )
         cls.dam = Animal.objects.create_with_event(
-            species=species,
+            species=cls.species,
             status=status,
             date=birthday,
-            entered_by=user,
-            location=location,
+            entered_by=cls.user,
+            location=cls.location,
             sex=Animal.Sex.FEMALE,
             band_number=2,
         )
         cls.nest = Location.objects.filter(nest=True).first()
 
+
+class NestInhabitantsTests:
+    """Tests shared by the functions that tabulate nest inhabitants. Subclasses
+    set `tabulate` to the function under test."""
+
+    tabulate = None
+
     def test_since_after_until(self):
         until = datetime.date.today()
         since = until - datetime.timedelta(days=3)
         with self.assertRaises(ValueError):
-            _ = tools.tabulate_nests(until, since)
+            _ = self.tabulate(until, since)
 
     def test_empty_nests(self):
         until = datetime.date.today()
         since = until - datetime.timedelta(days=3)
-        dates, data = tools.tabulate_nests(since, until)
+        dates, data = self.tabulate(since, until)
         self.assertEqual(len(dates), 4)
         self.assertEqual(dates[0], since)
         self.assertEqual(dates[-1], until)
@@ -66,7 +189,6 @@ class TabulateNestTest(TestCase):
             self.assertEqual(day, {"animals": {}, "counts": {}})
 
     def test_nest_has_inhabitants_on_correct_days(self):
-        user = models.get_sentinel_user()
         until = datetime.date.today()
         since = until - datetime.timedelta(days=4)
         status_laid = models.get_unborn_creation_event_type()
@@ -77,7 +199,7 @@ class TabulateNestTest(TestCase):
             dam=self.dam,
             began_on=since + datetime.timedelta(days=1),
             purpose="testing",
-            entered_by=user,
+            entered_by=self.user,
             location=self.nest,
         )
         # day 2: add an egg
@@ -86,7 +208,7 @@ class TabulateNestTest(TestCase):
             dam=self.dam,
             date=since + datetime.timedelta(days=2),
             status=status_laid,
-            entered_by=user,
+            entered_by=self.user,
             location=self.nest,
             description="testing 123",
         )
@@ -96,14 +218,14 @@ class TabulateNestTest(TestCase):
             status=status_hatched,
             location=self.nest,
             date=since + datetime.timedelta(days=3),
-            entered_by=user,
+            entered_by=self.user,
         )
         child_2 = Animal.objects.create_from_parents(
             sire=self.sire,
             dam=self.dam,
             date=since + datetime.timedelta(days=3),
             status=status_laid,
-            entered_by=user,
+            entered_by=self.user,
             location=self.nest,
             description="testing 123",
         )
@@ -113,13 +235,13 @@ class TabulateNestTest(TestCase):
             status=Status.objects.get(name=models.LOST_EVENT_NAME),
             location=self.nest,
             date=since + datetime.timedelta(days=4),
-            entered_by=user,
+            entered_by=self.user,
         )
-        _, data = tools.tabulate_nests(since, until)
+        _, data = self.tabulate(since, until)
         loc_data = data[0]
         self.assertEqual(loc_data["location"], self.nest)
         days = loc_data["days"]
-        self.assertDictEqual(days[0], {"animals": {}, "counts": {}})
+        self.assertEqual(days[0], {"animals": {}, "counts": {}})
         self.assertDictEqual(
             days[1], {"animals": {"adult": [self.sire, self.dam]}, "counts": {}}
         )
@@ -152,6 +274,107 @@ class TabulateNestTest(TestCase):
             },
         )
 
+    def test_age_group_changes_during_range(self):
+        # the age groups are for each day, not for today
+        until = datetime.date.today() - datetime.timedelta(days=10)
+        since = until - datetime.timedelta(days=3)
+        # juvenile is >= 35 days in the starter kit
+        chick = Animal.objects.create_with_event(
+            species=self.species,
+            status=models.get_birth_event_type(),
+            date=until - datetime.timedelta(days=36),
+            entered_by=self.user,
+            location=self.nest,
+        )
+        _, data = self.tabulate(since, until)
+        days = data[0]["days"]
+        self.assertEqual(days[0]["animals"], {"fledgling": [chick]})
+        self.assertEqual(days[1]["animals"], {"fledgling": [chick]})
+        self.assertEqual(days[2]["animals"], {"juvenile": [chick]})
+        self.assertEqual(days[3]["animals"], {"juvenile": [chick]})
+        self.assertEqual(days[1]["counts"], {"fledgling": 1})
+        self.assertEqual(days[2]["counts"], {"juvenile": 1})
+
+
+class TabulateNestTest(NestInhabitantsTests, BaseNestTest):
+    tabulate = staticmethod(tabulate_nests_by_day)
+
+
+class TabulateLocationsTest(NestInhabitantsTests, BaseNestTest):
+    tabulate = staticmethod(tools.tabulate_locations)
+
+    def test_empty_cells_are_shared(self):
+        until = datetime.date.today()
+        since = until - datetime.timedelta(days=3)
+        _, data = tools.tabulate_locations(since, until)
+        for day in data[0]["days"]:
+            self.assertIs(day, tools.EMPTY_CELL)
+        with self.assertRaises(TypeError):
+            tools.EMPTY_CELL["counts"]["fledgling"] = 1
+
+    def test_number_of_queries_does_not_depend_on_days(self):
+        until = datetime.date.today()
+        with self.assertNumQueries(4):
+            _ = tools.tabulate_locations(until - datetime.timedelta(days=2), until)
+        with self.assertNumQueries(4):
+            _ = tools.tabulate_locations(until - datetime.timedelta(days=20), until)
+
+    def test_age_groups_do_not_query_database(self):
+        until = datetime.date.today()
+        since = until - datetime.timedelta(days=4)
+        _ = Pairing.objects.create_with_events(
+            sire=self.sire,
+            dam=self.dam,
+            began_on=since,
+            purpose="testing",
+            entered_by=self.user,
+            location=self.nest,
+        )
+        _ = Animal.objects.create_from_parents(
+            sire=self.sire,
+            dam=self.dam,
+            date=since + datetime.timedelta(days=1),
+            status=models.get_unborn_creation_event_type(),
+            entered_by=self.user,
+            location=self.nest,
+        )
+        with self.assertNumQueries(4):
+            _, data = tools.tabulate_locations(since, until)
+            # names are rendered in the templates
+            for day in data[0]["days"]:
+                for animals in day["animals"].values():
+                    _ = [animal.name for animal in animals]
+
+    def test_animal_moved_out_of_nest(self):
+        until = datetime.date.today()
+        since = until - datetime.timedelta(days=2)
+        status_moved = Status.objects.get(name=models.MOVED_EVENT_NAME)
+        _ = Event.objects.create(
+            animal=self.sire,
+            status=status_moved,
+            location=self.nest,
+            date=since,
+            entered_by=self.user,
+        )
+        _ = Event.objects.create(
+            animal=self.sire,
+            status=status_moved,
+            location=self.location,
+            date=since + datetime.timedelta(days=1),
+            entered_by=self.user,
+        )
+        _, data = tools.tabulate_locations(since, until)
+        days = data[0]["days"]
+        self.assertDictEqual(days[0], {"animals": {"adult": [self.sire]}, "counts": {}})
+        self.assertEqual(days[1], {"animals": {}, "counts": {}})
+        self.assertEqual(days[2], {"animals": {}, "counts": {}})
+        self.assertEqual(data, tabulate_nests_by_day(since, until)[1])
+        # single days use a different query
+        for i, date in enumerate((since, since + datetime.timedelta(days=1), until)):
+            dates, data = tools.tabulate_locations(date, date)
+            self.assertEqual(dates, [date])
+            self.assertEqual(data[0]["days"], [days[i]])
+
 
 class TabulatePairsTests(TestCase):
     fixtures = ["bird_colony_starter_kit"]
@@ -160,24 +383,24 @@ class TabulatePairsTests(TestCase):
     def setUpTestData(cls):
         birthday = datetime.date.today() - datetime.timedelta(days=365)
         status = models.get_birth_event_type()
-        user = models.get_sentinel_user()
-        location = Location.objects.get(pk=1)
-        species = Species.objects.get(pk=1)
+        cls.user = models.get_sentinel_user()
+        cls.location = Location.objects.get(pk=1)
+        cls.species = Species.objects.get(pk=1)
         cls.sire = Animal.objects.create_with_event(
-            species=species,
+            species=cls.species,
             status=status,
             date=birthday,
-            entered_by=user,
-            location=location,
+            entered_by=cls.user,
+            location=cls.location,
             sex=Animal.Sex.MALE,
             band_number=1,
         )
         cls.dam = Animal.objects.create_with_event(
-            species=species,
+            species=cls.species,
             status=status,
             date=birthday,
-            entered_by=user,
-            location=location,
+            entered_by=cls.user,
+            location=cls.location,
             sex=Animal.Sex.FEMALE,
             band_number=2,
         )
@@ -198,7 +421,7 @@ class TabulatePairsTests(TestCase):
             dam=self.dam,
             began_on=began_on,
             purpose="testing",
-            entered_by=models.get_sentinel_user(),
+            entered_by=self.user,
             location=self.nest,
         )
         dates, data = tools.tabulate_pairs(since, until)
@@ -221,7 +444,7 @@ class TabulatePairsTests(TestCase):
             dam=self.dam,
             began_on=began_on,
             purpose="testing",
-            entered_by=models.get_sentinel_user(),
+            entered_by=self.user,
             location=self.nest,
         )
         dates, data = tools.tabulate_pairs(since, until)
@@ -234,7 +457,6 @@ class TabulatePairsTests(TestCase):
         self.assertEqual(pair_data["location"], self.nest)
 
     def test_pair_has_progeny_on_correct_days(self):
-        user = models.get_sentinel_user()
         until = datetime.date.today()
         since = until - datetime.timedelta(days=4)
         status_laid = models.get_unborn_creation_event_type()
@@ -245,7 +467,7 @@ class TabulatePairsTests(TestCase):
             dam=self.dam,
             began_on=since + datetime.timedelta(days=1),
             purpose="testing",
-            entered_by=user,
+            entered_by=self.user,
             location=self.nest,
         )
         # day 2: add an egg
@@ -254,7 +476,7 @@ class TabulatePairsTests(TestCase):
             dam=self.dam,
             date=since + datetime.timedelta(days=2),
             status=status_laid,
-            entered_by=user,
+            entered_by=self.user,
             location=self.nest,
             description="testing 123",
         )
@@ -264,14 +486,14 @@ class TabulatePairsTests(TestCase):
             status=status_hatched,
             location=self.nest,
             date=since + datetime.timedelta(days=3),
-            entered_by=user,
+            entered_by=self.user,
         )
         child_2 = Animal.objects.create_from_parents(
             sire=self.sire,
             dam=self.dam,
             date=since + datetime.timedelta(days=3),
             status=status_laid,
-            entered_by=user,
+            entered_by=self.user,
             location=self.nest,
             description="testing 123",
         )
@@ -281,7 +503,7 @@ class TabulatePairsTests(TestCase):
             status=Status.objects.get(name=models.LOST_EVENT_NAME),
             location=self.nest,
             date=since + datetime.timedelta(days=4),
-            entered_by=user,
+            entered_by=self.user,
         )
         _, data = tools.tabulate_pairs(since, until)
         pair_data = data[0]
@@ -301,12 +523,10 @@ class TabulatePairsTests(TestCase):
             dam=self.dam,
             began_on=since,
             purpose="testing",
-            entered_by=models.get_sentinel_user(),
+            entered_by=self.user,
             location=self.nest,
         )
-        pair.close(
-            until - datetime.timedelta(days=1), entered_by=models.get_sentinel_user()
-        )
+        pair.close(until - datetime.timedelta(days=1), entered_by=self.user)
         dates, data = tools.tabulate_pairs(since, until, only_active=True)
         self.assertEqual(len(data), 0)
 
@@ -319,7 +539,7 @@ class TabulatePairsTests(TestCase):
             dam=self.dam,
             began_on=began_on,
             purpose="testing",
-            entered_by=models.get_sentinel_user(),
+            entered_by=self.user,
             location=self.nest,
         )
         dates, data = tools.tabulate_pairs(since, until)
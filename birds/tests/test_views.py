@@ -17,6 +17,9 @@ from birds.models import (
     Location,
     NestCheck,
     Pairing,
+    Sample,
+    SampleLocation,
+    SampleType,
     Species,
     Status,
 )
@@ -135,6 +138,14 @@ class AnimalViewTests(BaseColonyTest):
         self.assertEqual(len(response.context["animal_list"]), 2 + self.n_children)
         self.assertDictEqual(response.context["query"], {"living": ["True"]})
 
+    def test_list_view_filters_and_annotates_animals(self):
+        response = self.client.get(reverse("birds:animals") + "?band=1&living=True")
+        self.assertEqual(response.status_code, 200)
+        animals = list(response.context["animal_list"])
+        self.assertEqual(animals, [self.sire])
+        self.assertTrue(animals[0].alive)
+        self.assertEqual(animals[0].last_location, self.nest.name)
+
     def test_event_view_url_exists_at_desired_location(self):
         response = self.client.get("/birds/events/")
         self.assertEqual(response.status_code, 200)
@@ -147,6 +158,12 @@ class AnimalViewTests(BaseColonyTest):
             len(response.context["event_list"]), 2 + self.n_children + self.n_eggs + 6
         )
 
+    def test_event_view_does_not_load_deferred_fields(self):
+        # one query to count the events and one to fetch the page
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("birds:events"))
+        self.assertEqual(response.status_code, 200)
+
     def test_bird_detail_404_invalid_bird_id(self):
         id = uuid.uuid4()
         response = self.client.get(reverse("birds:animal", args=[id]))
@@ -163,10 +180,26 @@ class AnimalViewTests(BaseColonyTest):
         self.assertEqual(
             len(response.context["animal_list"]), self.n_children + self.n_eggs
         )
+        self.assertEqual(
+            response.context["child_counts"],
+            {
+                "living": self.n_children,
+                "hatched": self.n_children,
+                "unhatched": self.n_eggs,
+            },
+        )
         # one hatch, old pairing started and ended, new pairing started
         self.assertEqual(len(response.context["event_list"]), 4)
         self.assertEqual(len(response.context["pairing_list"]), 2)
 
+    def test_child_detail_view_loads_parents_with_names(self):
+        child = self.sire.children.first()
+        # the parents are only shown by name, so their age groups are not loaded
+        with self.assertNumQueries(20):
+            response = self.client.get(reverse("birds:animal", args=[child.uuid]))
+        self.assertContains(response, self.sire.get_absolute_url())
+        self.assertContains(response, self.dam.get_absolute_url())
+
     def test_bird_events_404_invalid_bird_id(self):
         id = uuid.uuid4()
         response = self.client.get(reverse("birds:animal_events", args=[id]))
@@ -184,6 +217,49 @@ class AnimalViewTests(BaseColonyTest):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.context["event_list"]), 4)
 
+    def test_genealogy_view(self):
+        response = self.client.get(reverse("birds:genealogy", args=[self.sire.uuid]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["ancestors"][0]), 0)
+        # eggs are not included in descendents
+        descendents = response.context["descendents"]
+        self.assertEqual(len(descendents[0]), self.n_children)
+        self.assertEqual(len(descendents[1]), 0)
+        self.assertEqual(len(response.context["living"][0]), self.n_children)
+
+    def test_genealogy_view_of_child(self):
+        child = self.sire.children.hatched().first()
+        response = self.client.get(reverse("birds:genealogy", args=[child.uuid]))
+        self.assertEqual(response.status_code, 200)
+        self.assertCountEqual(response.context["ancestors"][0], [self.sire, self.dam])
+        self.assertEqual(len(response.context["descendents"][0]), 0)
+
+    def test_genealogy_view_queries_do_not_depend_on_descendents(self):
+        url = reverse("birds:genealogy", args=[self.sire.uuid])
+        with self.assertNumQueries(10):
+            self.client.get(url)
+        for _ in range(3):
+            Animal.objects.create_from_parents(
+                sire=self.sire,
+                dam=self.dam,
+                date=today(),
+                status=models.get_birth_event_type(),
+                entered_by=models.get_sentinel_user(),
+                location=self.nest,
+            )
+        with self.assertNumQueries(10):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context["descendents"][0]), self.n_children + 3)
+        # hatched children are counted in the annotation, not per row
+        response = self.client.get(reverse("birds:genealogy", args=[self.dam.uuid]))
+        child = response.context["descendents"][0][0]
+        self.assertEqual(child.n_children, 0)
+        response = self.client.get(reverse("birds:genealogy", args=[child.uuid]))
+        self.assertEqual(
+            {parent.n_children for parent in response.context["ancestors"][0]},
+            {self.n_children + 3},
+        )
+
 
 class PairingViewTests(BaseColonyTest):
     def test_pairing_list_url_exists_at_desired_location(self):
@@ -204,6 +280,29 @@ class PairingViewTests(BaseColonyTest):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.context["pairing_list"]), 1)
 
+    def test_pairing_view_with_progeny(self):
+        old_pairing = Pairing.objects.exclude(pk=self.pairing.pk).get()
+        response = self.client.get(reverse("birds:pairing", args=[old_pairing.pk]))
+        self.assertEqual(response.status_code, 200)
+        progeny = response.context["animal_list"]
+        self.assertEqual(len(progeny), self.n_children)
+        self.assertEqual(
+            [animal.created for animal in progeny],
+            sorted((animal.created for animal in progeny), reverse=True),
+        )
+        self.assertEqual(len(response.context["egg_list"]), 0)
+        self.assertCountEqual(response.context["pairing_list"], [self.pairing])
+
+    def test_pairing_view_with_eggs(self):
+        response = self.client.get(reverse("birds:pairing", args=[self.pairing.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["animal_list"]), 0)
+        eggs = response.context["egg_list"]
+        self.assertEqual(len(eggs), self.n_eggs)
+        self.assertEqual(
+            [egg.created for egg in eggs], sorted(egg.created for egg in eggs)
+        )
+
 
 class LocationViewTest(BaseColonyTest):
     def test_location_list_url_exists_at_desired_location(self):
@@ -224,6 +323,85 @@ class LocationViewTest(BaseColonyTest):
         self.assertEqual(len(response.context["animal_list"]), 2 + self.n_children)
 
 
+class SampleViewTest(BaseColonyTest):
+    def setUp(self):
+        for animal in (self.sire, self.dam):
+            Sample.objects.create(
+                type=SampleType.objects.get(pk=1),
+                animal=animal,
+                location=SampleLocation.objects.get(pk=1),
+                collected_by=models.get_sentinel_user(),
+            )
+
+    def test_sample_list_contains_all_samples(self):
+        # one query to count the samples and one to fetch the page
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("birds:samples"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["sample_list"]), 2)
+        self.assertFalse(response.context["filter"].is_bound)
+
+    def test_sample_list_filters_available_samples(self):
+        used_up = Sample.objects.create(
+            type=SampleType.objects.get(pk=1),
+            animal=self.sire,
+            collected_by=models.get_sentinel_user(),
+        )
+        response = self.client.get(reverse("birds:samples") + "?available=True")
+        self.assertEqual(len(response.context["sample_list"]), 2)
+        self.assertNotIn(used_up, response.context["sample_list"])
+        response = self.client.get(reverse("birds:samples") + "?available=False")
+        self.assertEqual(list(response.context["sample_list"]), [used_up])
+
+    def test_animal_sample_list(self):
+        response = self.client.get(
+            reverse("birds:animal_samples", args=[self.dam.uuid])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [sample.animal for sample in response.context["sample_list"]], [self.dam]
+        )
+
+
+class NewSampleFormViewTests(BaseColonyTest):
+    def setUp(self):
+        self.test_user1 = User.objects.create_user(
+            username="testuser1", password="1X<ISRUkw+tuK"
+        )
+        self.source = Sample.objects.create(
+            type=SampleType.objects.get(pk=1),
+            animal=self.sire,
+            collected_by=self.test_user1,
+        )
+        # a sample from another animal can't be used as the source
+        Sample.objects.create(
+            type=SampleType.objects.get(pk=1),
+            animal=self.dam,
+            collected_by=self.test_user1,
+        )
+
+    def test_source_choices_are_samples_from_animal(self):
+        self.client.login(username="testuser1", password="1X<ISRUkw+tuK")
+        response = self.client.get(reverse("birds:new_sample", args=[self.sire.uuid]))
+        self.assertEqual(response.status_code, 200)
+        sources = response.context["form"].fields["source"].queryset
+        self.assertEqual(list(sources), [self.source])
+
+    def test_add_sample(self):
+        self.client.login(username="testuser1", password="1X<ISRUkw+tuK")
+        response = self.client.post(
+            reverse("birds:new_sample", args=[self.sire.uuid]),
+            {
+                "type": 2,
+                "source": self.source.uuid,
+                "date": today(),
+                "collected_by": self.test_user1.pk,
+            },
+        )
+        self.assertRedirects(response, reverse("birds:animal", args=[self.sire.uuid]))
+        self.assertEqual(self.sire.sample_set.count(), 2)
+
+
 class UserViewTest(BaseColonyTest):
     def setUp(self):
         self.test_user1 = User.objects.create_user(
@@ -254,6 +432,22 @@ class UserViewTest(BaseColonyTest):
         self.assertCountEqual(response.context["animal_list"], [animal])
 
 
+class LocationSummaryTest(BaseColonyTest):
+    def test_location_summary(self):
+        # one query for the animals and one for the age groups
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("birds:location-summary"))
+        self.assertEqual(response.status_code, 200)
+        summary = dict(response.context["location_list"])
+        self.assertEqual(len(summary), 1)
+        # parents and all the children are adults in the nest
+        age_groups = dict(summary[self.nest.name])
+        self.assertCountEqual(age_groups["adult male"], [self.sire])
+        self.assertCountEqual(age_groups["adult female"], [self.dam])
+        self.assertEqual(len(age_groups["adult unknown"]), self.n_children)
+        self.assertContains(response, self.sire.get_absolute_url())
+
+
 class BreedingReportTests(BaseColonyTest):
     def test_breeding_report_url_exists_at_desired_location(self):
         response = self.client.get("/birds/summary/breeding/")
@@ -276,6 +470,9 @@ class BreedingReportTests(BaseColonyTest):
         response = self.client.get(reverse("birds:breeding-summary"))
         self.assertEqual(response.status_code, 200)
         self.assertCountEqual(response.context["checks"], [nest_check])
+        # the user is retrieved with the nest check
+        check = response.context["checks"][0]
+        self.assertTrue(NestCheck.entered_by.is_cached(check))
 
     def test_nest_report_bird_counts(self):
         response = self.client.get(reverse("birds:breeding-summary"))
@@ -285,6 +482,41 @@ class BreedingReportTests(BaseColonyTest):
             self.assertDictEqual(day, {"egg": i + 1})
 
 
+class NestReportTests(BaseColonyTest):
+    def test_nest_report_url_exists_at_desired_location(self):
+        response = self.client.get("/birds/summary/nests/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_nest_report_default_dates(self):
+        response = self.client.get(reverse("birds:nest-summary"))
+        self.assertEqual(response.status_code, 200)
+        dates = response.context["dates"]
+        self.assertEqual(len(dates), 5)
+        self.assertEqual(dates[0], today() - dt_days(4))
+        self.assertEqual(dates[-1], today())
+
+    def test_nest_report_shows_nest_inhabitants(self):
+        response = self.client.get(reverse("birds:nest-summary"))
+        nest_data = response.context["nest_data"]
+        self.assertEqual(nest_data[0]["location"], self.nest)
+        last_day = nest_data[0]["days"][-1]
+        self.assertIn(self.sire, last_day["animals"]["adult"])
+        self.assertIn(self.dam, last_day["animals"]["adult"])
+        self.assertEqual(last_day["counts"]["egg"], self.n_eggs)
+        self.assertContains(response, self.sire.get_absolute_url())
+        self.assertContains(response, self.nest.get_absolute_url())
+
+    def test_nest_check_list(self):
+        nest_check = NestCheck.objects.create(
+            entered_by=models.get_sentinel_user(),
+            datetime=make_aware(datetime.datetime.now()),
+            comments="much nesting",
+        )
+        response = self.client.get(reverse("birds:nest-summary"))
+        self.assertCountEqual(response.context["nest_checks"], [nest_check])
+        self.assertContains(response, "much nesting")
+
+
 class EventSummaryTests(TestCase):
     fixtures = ["bird_colony_starter_kit"]
 
@@ -600,6 +832,33 @@ class NewEventFormViewTests(TestCase):
         self.assertFalse(self.animal.alive())
 
 
+class ReservationFormViewTests(TestCase):
+    fixtures = ["bird_colony_starter_kit"]
+
+    def setUp(self):
+        # Create a user
+        self.test_user1 = User.objects.create_user(
+            username="testuser1", password="1X<ISRUkw+tuK"
+        )
+        self.test_user1.save()
+        species = Species.objects.get(pk=1)
+        self.animal = Animal.objects.create(species=species)
+
+    def test_create_and_release_reservation(self):
+        self.client.login(username="testuser1", password="1X<ISRUkw+tuK")
+        url = reverse("birds:update_reservation", args=[self.animal.uuid])
+        response = self.client.post(
+            url, {"date": today(), "entered_by": self.test_user1.pk}
+        )
+        self.assertRedirects(response, reverse("birds:animal", args=[self.animal.uuid]))
+        self.animal.refresh_from_db()
+        self.assertEqual(self.animal.reserved_by, self.test_user1)
+        response = self.client.post(url, {"date": today()})
+        self.animal.refresh_from_db()
+        self.assertIsNone(self.animal.reserved_by)
+        self.assertEqual(self.animal.event_set.count(), 2)
+
+
 class PairingFormViewTests(TestCase):
     fixtures = ["bird_colony_starter_kit"]
 
@@ -931,6 +1190,30 @@ class BreedingCheckFormViewTests(TestCase):
         nest_checks = NestCheck.objects.all()
         self.assertEqual(nest_checks.count(), 1)
 
+    def test_add_several_eggs_with_form(self):
+        data = {
+            "nests-TOTAL_FORMS": 1,
+            "nests-INITIAL_FORMS": 1,
+            "nests-0-location": self.nest.pk,
+            "nests-0-pairing": self.pairing.pk,
+            "nests-0-eggs": 3,
+            "nests-0-chicks": 0,
+        }
+        user_data = {
+            "user-entered_by": models.get_sentinel_user().pk,
+            "user-confirmed": "on",
+        }
+        self.client.login(username="testuser1", password="1X<ISRUkw+tuK")
+        response = self.client.post(reverse("birds:breeding-check"), data | user_data)
+        self.assertRedirects(response, reverse("birds:breeding-summary"))
+        eggs = self.sire.children.with_dates().unhatched()
+        self.assertEqual(eggs.count(), 3)
+        for egg in eggs:
+            self.assertEqual(egg.species, self.sire.species)
+            self.assertEqual(egg.dam(), self.dam)
+            self.assertEqual(egg.first_event_on, today())
+            self.assertEqual(egg.event_set.get().location, self.nest)
+
     def test_hatch_egg_with_form(self):
         user = models.get_sentinel_user()
         status_laid = models.get_unborn_creation_event_type()
@@ -2,110 +2,164 @@
 # -*- mode: python -*-
 """ Tools for classifying birds and computing summaries """
 import datetime
+from bisect import bisect_right
 from collections import Counter, defaultdict
+from itertools import groupby
+from operator import attrgetter, itemgetter
+from types import MappingProxyType
+from typing import Callable, Optional, Sequence, Union
+
+from django.db.models import QuerySet
+
+from birds.models import (
+    ADULT_ANIMAL_NAME,
+    UNBORN_ANIMAL_NAME,
+    Animal,
+    Event,
+    Location,
+    Pairing,
+)
+
+# shared (read-only) entry for nests with no animals on a given day
+EMPTY_CELL = MappingProxyType(
+    {"animals": MappingProxyType({}), "counts": MappingProxyType({})}
+)
+
+
+def sort_and_group(
+    qs, key: Union[str, Callable], order_by: Optional[Sequence[str]] = None
+):
+    """Sort and group a queryset by a key function or attribute name.
 
-from birds.models import ADULT_ANIMAL_NAME, Animal, Event, Location, Pairing
-
-
-def sort_and_group(qs, key):
-    """Sort and group a queryset by a key function"""
-    from itertools import groupby
+    If `order_by` is supplied, the sorting is done by the database using these
+    fields and the results are streamed rather than loaded into memory. The
+    ordering must be consistent with `key`.
 
+    """
+    if isinstance(key, str):
+        key = attrgetter(key)
+    if order_by is not None:
+        return groupby(qs.order_by(*order_by).iterator(chunk_size=2000), key)
     return groupby(sorted(qs, key=key), key)
 
 
-def find_first(iterable, predicate):
-    """Return the first item in iterable that matches predicate, or None if no match"""
-    for item in iterable:
-        if predicate(item):
-            return item
-
+def find_first(iterable, predicate=None, **filters):
+    """Return the first item in iterable that matches predicate, or None if no match.
 
-# old version of this function
-def tabulate_locations(since, until):
-    """Determines which animals are in which nests by date.
-
-    In principle, it would be best to do this by using the database to
-    generate a summary for day 0, then march through the subsequent days and
-    use new events to generate new summaries. However, in practice it's not
-    trivial to update this structure, so we're taking the lazy but probably
-    more inefficient route of querying the database for each day. Consider
-    the other option if it becomes too slow.
+    If iterable is a QuerySet, keyword arguments can be used instead of a
+    predicate to do the filtering in the database.
 
     """
-    repdate = since
-    nests = Location.objects.filter(nest=True).order_by("name")
-    dates = []
-    data = {}
-    while repdate <= until:
-        locations = defaultdict(list)
-        alive = Animal.objects.existing(repdate)
-        qs = (
-            Event.objects.has_location()
-            .latest_by_animal()
-            .select_related("location", "animal")
-            .filter(date__lte=repdate, animal__in=alive)
-        )
-        for event in qs:
-            if event.location.nest:
-                locations[event.location].append(event.animal)
-        data[repdate] = locations
-        dates.append(repdate)
-        repdate += datetime.timedelta(days=1)
-    # pivot the structure while tabulating by age group to help the template engine
-    nest_data = []
-    for nest in nests:
-        days = []
-        for date in dates:
-            animals = data[date].get(nest, [])
-            locdata = {"animals": defaultdict(list), "counts": Counter()}
-            for animal in animals:
-                age_group = animal.age_group(date)
-                locdata["animals"][age_group].append(animal)
-                if age_group != ADULT_ANIMAL_NAME:
-                    locdata["counts"][age_group] += 1
-            days.append(locdata)
-        nest_data.append({"location": nest, "days": days})
-    return dates, nest_data
+    if filters:
+        if not isinstance(iterable, QuerySet):
+            raise TypeError("filter lookups can only be used with a QuerySet")
+        iterable = iterable.filter(**filters)
+        if predicate is None:
+            return iterable.first()
+    return next(filter(predicate, iterable), None)
 
 
-def tabulate_nests(since: datetime.date, until: datetime.date):
+def tabulate_locations(since: datetime.date, until: datetime.date):
     """Determines which animals are in which nests by date.
 
-    In principle, it would be best to do this by using the database to generate
-    a summary for day 0, then march through the subsequent days and use new
-    events to generate new summaries. However, in practice it's not trivial to
-    update this structure, so we're taking the lazy but probably more
-    inefficient route of querying the database for each day and each nest.
-    Consider the other option if it becomes too slow.
+    Rather than querying the database for each day and each nest, all the
+    animals that existed during the range of dates are retrieved in a single
+    query, along with all of their events with a location through `until`. Then
+    for each animal and date, the most recent location is found with a binary
+    search of the animal's event dates.
 
     """
     if since > until:
         raise ValueError("until must be after since")
     n_days = (until - since).days + 1
     dates = [since + datetime.timedelta(days=x) for x in range(n_days)]
-    data = []
-    for nest in Location.objects.filter(nest=True).order_by("name"):
-        days = []
-        for date in dates:
-            by_group = defaultdict(list)
-            counts = Counter()
-            birds = (
-                nest.birds(date)
-                .existing(date)
-                .with_dates(date)
-                .select_related("species", "band_color")
-                .prefetch_related("species__age_set")
-                .order_by("band_color", "band_number")
-            )
-            for bird in birds:
-                age_group = bird.age_group()
-                by_group[age_group].append(bird)
-                if age_group is not None and age_group != ADULT_ANIMAL_NAME:
-                    counts[age_group] += 1
-            days.append({"animals": dict(by_group), "counts": dict(counts)})
-        data.append({"location": nest, "days": days})
-    return dates, data
+    # ages are computed from ordinals to avoid creating timedeltas in the inner loop
+    date_ords = [date.toordinal() for date in dates]
+    nests = list(Location.objects.filter(nest=True).order_by("name"))
+    nest_index = {nest.pk: i for i, nest in enumerate(nests)}
+    animals = (
+        Animal.objects.existing_between(since, until)
+        .select_related("species", "band_color")
+        .prefetch_related("species__age_set")
+        .order_by("band_color", "band_number")
+    )
+    # keep track of the position of each animal to restore the ordering later
+    animals = {animal.pk: (rank, animal) for rank, animal in enumerate(animals)}
+    events = Event.objects.has_location().filter(
+        date__lte=until, animal__in=list(animals)
+    )
+    if since == until:
+        # for a single day, only the most recent location of each animal is needed
+        events = events.latest_by_animal()
+        event_order = ("animal_id", "-date", "-created")
+    else:
+        event_order = ("animal_id", "date", "created")
+    # only the fields needed to locate the animals are retrieved
+    events = events.values_list("animal_id", "date", "location_id")
+    age_groups = {}
+    # (nest index, date index, rank, animal, age group) for each animal on each
+    # day it was in a nest. The events are streamed from the database one
+    # animal at a time.
+    placements = []
+    for animal_id, animal_events in sort_and_group(
+        events, key=itemgetter(0), order_by=event_order
+    ):
+        rank, animal = animals[animal_id]
+        event_dates = []
+        location_ids = []
+        for _, event_date, location_id in animal_events:
+            event_dates.append(event_date)
+            location_ids.append(location_id)
+        # the age groups for each species as parallel lists sorted by minimum age
+        try:
+            min_days, age_names = age_groups[animal.species_id]
+        except KeyError:
+            ages = sorted(animal.species.age_set.all(), key=attrgetter("min_days"))
+            min_days = [age.min_days for age in ages]
+            age_names = [age.name for age in ages]
+            age_groups[animal.species_id] = (min_days, age_names)
+        born_ord = animal.born_on.toordinal() if animal.born_on is not None else None
+        for j, (date, date_ord) in enumerate(zip(dates, date_ords)):
+            if animal.first_event_on > date:
+                continue
+            if animal.removed_on is not None and animal.removed_on <= date:
+                break
+            idx = bisect_right(event_dates, date)
+            if idx == 0:
+                continue
+            i = nest_index.get(location_ids[idx - 1])
+            if i is None:
+                continue
+            # this duplicates the logic in Animal.age_group() to avoid
+            # repeating the lookup for each day
+            if born_ord is not None and born_ord <= date_ord:
+                k = bisect_right(min_days, date_ord - born_ord)
+                age_group = age_names[k - 1] if k > 0 else None
+            elif animal.acquired_on is not None and animal.acquired_on <= date:
+                age_group = ADULT_ANIMAL_NAME
+            else:
+                age_group = UNBORN_ANIMAL_NAME
+            placements.append((i, j, rank, animal, age_group))
+    # tabulate by age group only the cells that have animals in them
+    placements.sort(key=itemgetter(0, 1, 2))
+    cells = {}
+    for cell, cell_placements in groupby(placements, key=itemgetter(0, 1)):
+        by_group = defaultdict(list)
+        counts = Counter()
+        for *_, animal, age_group in cell_placements:
+            by_group[age_group].append(animal)
+            if age_group is not None and age_group != ADULT_ANIMAL_NAME:
+                counts[age_group] += 1
+        cells[cell] = {"animals": dict(by_group), "counts": dict(counts)}
+    # pivot the structure to help the template engine
+    nest_data = [
+        {
+            "location": nest,
+            "days": [cells.get((i, j), EMPTY_CELL) for j in range(n_days)],
+        }
+        for i, nest in enumerate(nests)
+    ]
+    return dates, nest_data
 
 
 def tabulate_pairs(
@@ -94,6 +94,7 @@ urlpatterns = [
         name="location-summary",
     ),
     re_path(r"^summary/breeding/$", views.breeding_report, name="breeding-summary"),
+    re_path(r"^summary/nests/$", views.nest_report, name="nest-summary"),
     path(
         "summary/events/<int:year>/<int:month>/",
         views.event_summary,
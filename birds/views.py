@@ -3,12 +3,12 @@
 import calendar
 import datetime
 from collections import Counter, defaultdict
-from itertools import groupby
 from typing import Optional
 
 from django.contrib.auth.models import User
 from django.core.paginator import Paginator
-from django.db.models import Count, F, Q
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Prefetch, Q
 from django.db.utils import IntegrityError
 from django.forms import ValidationError, formset_factory
 from django.http import Http404, HttpResponseRedirect
@@ -18,7 +18,6 @@ from django.utils import dateparse
 from django.utils.timezone import make_aware
 from django.utils.translation import gettext_lazy as _
 from django.views.decorators.http import require_http_methods
-from django_filters.rest_framework import DjangoFilterBackend
 from drf_link_header_pagination import LinkHeaderPagination
 from rest_framework import generics
 from rest_framework.decorators import api_view
@@ -29,6 +28,7 @@ from birds.filters import (
     AnimalFilter,
     EventFilter,
     PairingFilter,
+    RequestedFilterBackend,
     SampleFilter,
 )
 from birds.forms import (
@@ -45,11 +45,13 @@ from birds.forms import (
 )
 from birds.models import (
     ADULT_ANIMAL_NAME,
+    UNBORN_ANIMAL_NAME,
     Animal,
     Event,
     Location,
     NestCheck,
     Pairing,
+    Parent,
     Sample,
     SampleType,
 )
@@ -60,7 +62,9 @@ from birds.serializers import (
     EventSerializer,
     PedigreeRequestSerializer,
 )
-from birds.tools import tabulate_nests, tabulate_pairs
+from birds.tools import sort_and_group, tabulate_locations, tabulate_pairs
+
+BreedingCheckFormSet = formset_factory(BreedingCheckForm, extra=0)
 
 
 class LargeResultsSetPagination(LinkHeaderPagination):
@@ -86,19 +90,25 @@ def index(request):
 # Animals
 @require_http_methods(["GET"])
 def animal_list(request):
-    qs = (
-        Animal.objects.with_annotations()
-        .with_related()
-        .order_by("band_color", "band_number")
-    )
+    ordering = ("band_color", "band_number", "uuid")
+    qs = Animal.objects.order_by(*ordering)
     query = request.GET.copy()
     try:
         page_number = query.pop("page")[-1]
     except (KeyError, IndexError):
         page_number = None
-    f = AnimalFilter(query, queryset=qs)
+    # an unbound filterset skips form validation when there are no parameters
+    f = AnimalFilter(query or None, queryset=qs)
     paginator = Paginator(f.qs, 25)
     page_obj = paginator.get_page(page_number)
+    # the annotations are expensive, so they are only computed for the current page
+    animals = (
+        Animal.objects.with_annotations()
+        .with_child_counts()
+        .with_related()
+        .filter(uuid__in=[animal.uuid for animal in page_obj])
+        .order_by(*ordering)
+    )
 
     return render(
         request,
@@ -107,20 +117,40 @@ def animal_list(request):
             "filter": f,
             "query": query,
             "page_obj": page_obj,
-            "animal_list": page_obj.object_list,
+            "animal_list": animals,
         },
     )
 
 
 @require_http_methods(["GET"])
 def animal_view(request, uuid: str):
-    qs = Animal.objects.with_annotations()
+    # the page does not show the animal's location
+    qs = (
+        Animal.objects.with_dates()
+        .with_related()
+        .prefetch_related(
+            Prefetch(
+                "parents",
+                queryset=Animal.objects.select_related("species", "band_color"),
+            ),
+        )
+    )
     animal = get_object_or_404(qs, uuid=uuid)
-    kids = (
+    kids = list(
         animal.children.with_annotations()
+        .with_child_counts()
         .with_related()
         .order_by("-alive", F("age").desc(nulls_last=True))
     )
+    # the children are already annotated with dates, so count them in python
+    # instead of issuing a query for each count
+    child_counts = {
+        "living": sum(1 for kid in kids if kid.alive),
+        "hatched": sum(1 for kid in kids if kid.born_on is not None),
+        "unhatched": sum(
+            1 for kid in kids if kid.born_on is None and kid.first_event_on is not None
+        ),
+    }
     events = animal.event_set.with_related().order_by("-date", "-created")
     samples = animal.sample_set.order_by("-date")
     pairings = (
@@ -132,6 +162,7 @@ def animal_view(request, uuid: str):
         {
             "animal": animal,
             "animal_list": kids,
+            "child_counts": child_counts,
             "event_list": events,
             "sample_list": samples,
             "pairing_list": pairings,
@@ -142,19 +173,15 @@ def animal_view(request, uuid: str):
 @require_http_methods(["GET"])
 def animal_genealogy(request, uuid: str):
     animal = get_object_or_404(Animal.objects.with_dates(), pk=uuid)
-    generations = (1, 2, 3, 4)
-    ancestors = [
-        Animal.objects.ancestors_of(animal, generation=gen).with_annotations()
-        for gen in generations
-    ]
-    descendents = [
-        Animal.objects.descendents_of(animal, generation=gen)
-        .with_annotations()
-        .hatched()
+    qs = Animal.objects.with_annotations().with_child_counts().with_related()
+    ancestors = qs.ancestors_by_generation(animal, generations=4)
+    descendents = (
+        qs.hatched()
         .order_by("-alive", "-age")
-        for gen in generations
-    ]
-    living = [qs.alive() for qs in descendents]
+        .descendents_by_generation(animal, generations=4)
+    )
+    # count the living descendents in python to avoid another query
+    living = [[bird for bird in gen if bird.alive] for gen in descendents]
     return render(
         request,
         "birds/genealogy.html",
@@ -270,14 +297,15 @@ def reservation_entry(request, uuid: str):
             else:
                 user = animal.reserved_by = data["entered_by"]
                 descr = f"reservation created: {data['description']}"
-            animal.save()
-            Event.objects.create(
-                animal=animal,
-                date=data["date"],
-                status=data["status"],
-                entered_by=user,
-                description=descr,
-            )
+            with transaction.atomic():
+                animal.save(update_fields=["reserved_by"])
+                Event.objects.create(
+                    animal=animal,
+                    date=data["date"],
+                    status=data["status"],
+                    entered_by=user,
+                    description=descr,
+                )
             return HttpResponseRedirect(reverse("birds:animal", args=(animal.pk,)))
     else:
         form = ReservationForm()
@@ -293,7 +321,23 @@ def reservation_entry(request, uuid: str):
 def event_list(
     request, *, animal: Optional[str] = None, location: Optional[int] = None
 ):
-    qs = Event.objects.with_related().order_by("-date", "-created")
+    # only load the columns that the list shows
+    qs = (
+        Event.objects.with_related()
+        .only(
+            "date",
+            "created",
+            "description",
+            "animal__uuid",
+            "animal__band_number",
+            "animal__band_color__name",
+            "animal__species__code",
+            "status__name",
+            "location__name",
+            "entered_by__username",
+        )
+        .order_by("-date", "-created")
+    )
     if animal is not None:
         animal = get_object_or_404(Animal, uuid=animal)
         qs = qs.filter(animal=animal)
@@ -309,7 +353,7 @@ def event_list(
         page_number = query.pop("page")[-1]
     except (KeyError, IndexError):
         page_number = None
-    f = EventFilter(query, queryset=qs)
+    f = EventFilter(query or None, queryset=qs)
     paginator = Paginator(f.qs, 25)
     page_obj = paginator.get_page(page_number)
     return render(
@@ -375,7 +419,14 @@ def location_list(request):
 @require_http_methods(["GET"])
 def location_view(request, pk):
     location = get_object_or_404(Location, pk=pk)
-    birds = location.birds().with_dates().with_related().alive().order_by("-created")
+    birds = (
+        location.birds()
+        .with_dates()
+        .with_child_counts()
+        .with_related()
+        .alive()
+        .order_by("-created")
+    )
     eggs = location.birds().unhatched().existing().order_by("-created")
     events = location.event_set.with_related()
     return render(
@@ -409,14 +460,17 @@ def user_list(request):
 def user_view(request, pk):
     user = get_object_or_404(User, pk=pk)
     reserved = (
-        user.animal_set.with_annotations().with_related().order_by("-alive", "-age")
+        user.animal_set.with_annotations()
+        .with_child_counts()
+        .with_related()
+        .order_by("-alive", "-age")
     )
     query = request.GET.copy()
     try:
         page_number = query.pop("page")[-1]
     except (KeyError, IndexError):
         page_number = None
-    f = AnimalFilter(query, queryset=reserved)
+    f = AnimalFilter(query or None, queryset=reserved)
     paginator = Paginator(f.qs, 25)
     page_obj = paginator.get_page(page_number)
     return render(
@@ -441,7 +495,7 @@ def pairing_list(request):
         page_number = query.pop("page")[-1]
     except (KeyError, IndexError):
         page_number = None
-    f = PairingFilter(query, queryset=qs)
+    f = PairingFilter(query or None, queryset=qs)
     paginator = Paginator(f.qs, 25)
     page_obj = paginator.get_page(page_number)
     return render(
@@ -454,7 +508,7 @@ def pairing_list(request):
 @require_http_methods(["GET"])
 def active_pairing_list(request):
     qs = Pairing.objects.with_related().with_progeny_stats().with_location()
-    f = PairingFilter(request.GET, queryset=qs)
+    f = PairingFilter(request.GET or None, queryset=qs)
     return render(
         request,
         "birds/pairing_list_active.html",
@@ -466,14 +520,21 @@ def active_pairing_list(request):
 def pairing_view(request, pk):
     qs = Pairing.objects.with_related().with_progeny_stats()
     pair = get_object_or_404(qs, pk=pk)
-    progeny = (
+    # retrieve hatched and unhatched offspring in one query and split them here
+    offspring = (
         pair.eggs()
         .with_annotations()
+        .with_child_counts()
         .with_related()
-        .hatched()
-        .order_by("-alive", "-created")
+        .order_by("created")
     )
-    eggs = pair.eggs().with_annotations().with_related().unhatched().order_by("created")
+    eggs = []
+    progeny = []
+    for animal in offspring:
+        (eggs if animal.born_on is None else progeny).append(animal)
+    # living progeny first, then most recent first
+    progeny.reverse()
+    progeny.sort(key=lambda animal: not animal.alive)
     pairings = pair.other_pairings().with_progeny_stats()
     events = pair.events().with_related()
     return render(
@@ -572,14 +633,29 @@ def sample_type_list(request):
 
 @require_http_methods(["GET"])
 def sample_list(request, animal: Optional[str] = None):
-    qs = Sample.objects.select_related(
-        "type",
-        "location",
-        "collected_by",
-        "animal",
-        "animal__species",
-        "animal__band_color",
-    ).order_by("-date")
+    # only load the columns that the list shows
+    qs = (
+        Sample.objects.select_related(
+            "type",
+            "location",
+            "collected_by",
+            "animal",
+            "animal__species",
+            "animal__band_color",
+        )
+        .only(
+            "uuid",
+            "date",
+            "type__name",
+            "location__name",
+            "collected_by__username",
+            "animal__uuid",
+            "animal__band_number",
+            "animal__species__code",
+            "animal__band_color__name",
+        )
+        .order_by("-date")
+    )
     if animal is not None:
         animal = get_object_or_404(Animal, uuid=animal)
         qs = qs.filter(animal=animal)
@@ -588,7 +664,7 @@ def sample_list(request, animal: Optional[str] = None):
         page_number = query.pop("page")[-1]
     except (KeyError, IndexError):
         page_number = None
-    f = SampleFilter(query, queryset=qs)
+    f = SampleFilter(query or None, queryset=qs)
     paginator = Paginator(f.qs, 25)
     page_obj = paginator.get_page(page_number)
     return render(
@@ -615,9 +691,16 @@ def sample_view(request, uuid: str):
 
 @require_http_methods(["GET", "POST"])
 def new_sample_entry(request, uuid: str):
-    animal = get_object_or_404(Animal, pk=uuid)
+    animal = get_object_or_404(
+        Animal.objects.select_related("species", "band_color"), pk=uuid
+    )
+    # the source choices are labeled with the animal and sample type
+    sources = Sample.objects.filter(animal=animal).select_related(
+        "type", "animal__species", "animal__band_color"
+    )
     if request.method == "POST":
         form = SampleForm(request.POST)
+        form.fields["source"].queryset = sources
         if form.is_valid():
             sample = form.save(commit=False)
             sample.animal = animal
@@ -625,7 +708,7 @@ def new_sample_entry(request, uuid: str):
             return HttpResponseRedirect(reverse("birds:animal", args=(animal.pk,)))
     else:
         form = SampleForm()
-        form.fields["source"].queryset = Sample.objects.filter(animal=animal)
+        form.fields["source"].queryset = sources
         form.initial["collected_by"] = request.user
 
     return render(request, "birds/sample_entry.html", {"form": form, "animal": animal})
@@ -634,15 +717,20 @@ def new_sample_entry(request, uuid: str):
 # Summary views
 @require_http_methods(["GET"])
 def location_summary(request):
-    # do this with a single query and then group by location
+    # do this with a single query and then group by location. Only the fields
+    # needed to name and classify the animals are retrieved.
     qs = (
         Animal.objects.with_annotations()
-        .with_related()
+        .select_related("species", "band_color")
+        .prefetch_related("species__age_set")
+        .only("uuid", "sex", "band_number", "species__code", "band_color__name")
         .alive()
-        .order_by("last_location")
     )
     loc_data = []
-    for location, animals in groupby(qs, key=lambda animal: animal.last_location):
+    # the animals are streamed from the database in location order
+    for location, animals in sort_and_group(
+        qs, key="last_location", order_by=("last_location",)
+    ):
         d = defaultdict(list)
         for animal in animals:
             age_group = animal.age_group()
@@ -673,9 +761,11 @@ def breeding_report(request):
     if until - since > datetime.timedelta(days=9):
         raise ValueError("report cannot span more than 10 days")
     dates, pairs = tabulate_pairs(since, until)
-    checks = NestCheck.objects.filter(
-        datetime__date__gte=since, datetime__date__lte=until
-    ).order_by("-datetime")
+    checks = (
+        NestCheck.objects.with_related()
+        .filter(datetime__date__gte=since, datetime__date__lte=until)
+        .order_by("-datetime")
+    )
     return render(
         request,
         "birds/breeding_report.html",
@@ -699,12 +789,14 @@ def nest_report(request):
         since = dateparse.parse_date(request.GET["since"])
     except (ValueError, KeyError):
         since = None
-    until = until or datetime.datetime.now().date()
+    until = until or datetime.date.today()
     since = since or (until - datetime.timedelta(days=default_days))
-    dates, nest_data = tabulate_nests(since, until)
-    checks = NestCheck.objects.filter(
-        datetime__date__gte=since, datetime__date__lte=until
-    ).order_by("datetime")
+    dates, nest_data = tabulate_locations(since, until)
+    checks = (
+        NestCheck.objects.with_related()
+        .filter(datetime__date__gte=since, datetime__date__lte=until)
+        .order_by("datetime")
+    )
     return render(
         request,
         "birds/nest_report.html",
@@ -718,6 +810,23 @@ def nest_report(request):
     )
 
 
+def _breeding_check_initial(pairs):
+    """Initial nest check values from the last day in the output of tabulate_pairs()"""
+    initial = []
+    for pairing in pairs:
+        counts = pairing["counts"][-1]
+        eggs = counts[UNBORN_ANIMAL_NAME]
+        initial.append(
+            {
+                "pairing": pairing["pair"],
+                "location": pairing["location"],
+                "eggs": eggs,
+                "chicks": counts.total() - eggs,
+            }
+        )
+    return initial
+
+
 @require_http_methods(["GET", "POST"])
 def breeding_check(request):
     """Nest check view.
@@ -730,23 +839,13 @@ def breeding_check(request):
     main breeding-report page.
 
     """
-    BreedingCheckFormSet = formset_factory(BreedingCheckForm, extra=0)
     until = datetime.date.today()
 
     if request.method == "POST":
         # post only needs to tabulate for today unless there's an error
         _, pairs = tabulate_pairs(until, until)
-        initial = [
-            {
-                "pairing": p["pair"],
-                "location": p["location"],
-                "eggs": (n_eggs := p["counts"][0]["egg"]),
-                "chicks": p["counts"][0].total() - n_eggs,
-            }
-            for p in pairs
-        ]
         nest_formset = BreedingCheckFormSet(
-            request.POST, initial=initial, prefix="nests"
+            request.POST, initial=_breeding_check_initial(pairs), prefix="nests"
         )
         user_form = NestCheckUser(request.POST, prefix="user")
         if nest_formset.is_valid():
@@ -763,57 +862,60 @@ def breeding_check(request):
             else:
                 # coming from the confirmation page
                 user = user_form.cleaned_data["entered_by"]
-                for form in nest_formset:
-                    data = form.cleaned_data
-                    for hatched_egg in data["hatched_eggs"]:
-                        _ = Event.objects.create(
-                            animal=hatched_egg,
-                            date=datetime.date.today(),
-                            status=data["hatch_status"],
-                            location=data["location"],
-                            entered_by=user,
-                        )
-                    for lost_egg in data["lost_eggs"]:
-                        _ = Event.objects.create(
-                            animal=lost_egg,
-                            date=datetime.date.today(),
-                            status=data["lost_status"],
-                            location=data["location"],
-                            entered_by=user,
-                        )
-                    for _ in range(data["added_eggs"]):
-                        data["pairing"].create_egg(
-                            date=datetime.date.today(),
-                            location=data["location"],
-                            entered_by=user,
-                        )
-                NestCheck.objects.create(
-                    entered_by=user,
-                    comments=user_form.cleaned_data["comments"],
-                    datetime=make_aware(datetime.datetime.now()),
-                )
+                # use the date the counts were validated against, even if the
+                # check is submitted right at midnight
+                today = until
+                # collect the events so they can be inserted in bulk
+                new_events = []
+                with transaction.atomic():
+                    for form in nest_formset:
+                        data = form.cleaned_data
+                        for hatched_egg in data["hatched_eggs"]:
+                            new_events.append(
+                                Event(
+                                    animal=hatched_egg,
+                                    date=today,
+                                    status=data["hatch_status"],
+                                    location=data["location"],
+                                    entered_by=user,
+                                )
+                            )
+                        for lost_egg in data["lost_eggs"]:
+                            new_events.append(
+                                Event(
+                                    animal=lost_egg,
+                                    date=today,
+                                    status=data["lost_status"],
+                                    location=data["location"],
+                                    entered_by=user,
+                                )
+                            )
+                        if data["added_eggs"] > 0:
+                            data["pairing"].create_eggs(
+                                data["added_eggs"],
+                                today,
+                                entered_by=user,
+                                location=data["location"],
+                            )
+                    Event.objects.bulk_create(new_events)
+                    NestCheck.objects.create(
+                        entered_by=user,
+                        comments=user_form.cleaned_data["comments"],
+                        datetime=make_aware(datetime.datetime.now()),
+                    )
                 return HttpResponseRedirect(reverse("birds:breeding-summary"))
 
     # initial view on get or errors
     since = until - datetime.timedelta(days=2)
     dates, pairs = tabulate_pairs(since, until, only_active=True)
-    initial = []
-    for pairing in pairs:
-        today_counts = pairing["counts"][-1]
-        total_count = sum(today_counts.values())
-        eggs = today_counts.get("egg", 0)
-        initial.append(
-            {
-                "pairing": pairing["pair"],
-                "location": pairing["location"],
-                "eggs": eggs,
-                "chicks": total_count - eggs,
-            }
-        )
-    nest_formset = BreedingCheckFormSet(initial=initial, prefix="nests")
-    previous_checks = NestCheck.objects.filter(
-        datetime__date__gte=(until - datetime.timedelta(days=7))
-    ).order_by("-datetime")
+    nest_formset = BreedingCheckFormSet(
+        initial=_breeding_check_initial(pairs), prefix="nests"
+    )
+    previous_checks = (
+        NestCheck.objects.with_related()
+        .filter(datetime__date__gte=(until - datetime.timedelta(days=7)))
+        .order_by("-datetime")
+    )
 
     return render(
         request,
@@ -884,14 +986,18 @@ def api_info(request, format=None):
 
 
 class APIAnimalsList(generics.ListAPIView):
+    # the serializer only needs the parents' uuid (and sex to tell them apart)
     queryset = (
         Animal.objects.with_dates()
-        .select_related("reserved_by", "species", "band_color")
-        .prefetch_related("parents")
+        .select_related("reserved_by", "species", "band_color", "plumage")
+        .defer("attributes")
+        .prefetch_related(
+            Prefetch("parents", queryset=Animal.objects.only("uuid", "sex"))
+        )
         .order_by("band_color", "band_number")
     )
     serializer_class = AnimalSerializer
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (RequestedFilterBackend,)
     filterset_class = AnimalFilter
 
 
@@ -899,13 +1005,10 @@ class APIAnimalChildList(APIAnimalsList):
     """List all the children of an animal"""
 
     def get_queryset(self):
-        animal = get_object_or_404(Animal, uuid=self.kwargs["pk"])
-        return (
-            animal.children.with_dates()
-            .select_related("reserved_by", "species", "band_color")
-            .prefetch_related("parents")
-            .order_by("band_color", "band_number")
-        )
+        # only need to know the animal exists; the children are loaded with
+        # the same related objects as the full list
+        animal = get_object_or_404(Animal.objects.only("uuid"), uuid=self.kwargs["pk"])
+        return super().get_queryset().filter(parents=animal)
 
 
 @api_view(["GET"])
@@ -918,7 +1021,7 @@ def api_animal_detail(request, pk: str, format=None):
 class APIEventsList(generics.ListAPIView):
     queryset = Event.objects.with_related()
     serializer_class = EventSerializer
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (RequestedFilterBackend,)
     filterset_class = EventFilter
 
 
@@ -930,23 +1033,24 @@ class APIAnimalPedigree(generics.ListAPIView):
     """
 
     serializer_class = AnimalPedigreeSerializer
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (RequestedFilterBackend,)
     filterset_class = AnimalFilter
     pagination_class = LargeResultsSetPagination
 
     def get_queryset(self):
-        from django.db.models import Count
-
+        # the parents are only used for their names
+        parents = Animal.objects.select_related("species", "band_color").only(
+            "uuid", "sex", "band_number", "species__code", "band_color__name"
+        )
         queryset = (
             Animal.objects.with_dates()
             .select_related("reserved_by", "species", "band_color", "plumage")
-            .prefetch_related("parents__species")
-            .prefetch_related("parents__band_color")
+            .defer("attributes")
+            .prefetch_related(Prefetch("parents", queryset=parents))
             .order_by("band_color", "band_number")
         )
         request_parsed = PedigreeRequestSerializer(data=self.request.query_params)
         if request_parsed.is_valid() and request_parsed.data["restrict"]:
-            queryset = queryset.annotate(nchildren=Count("children")).filter(
-                Q(alive__gt=0) | Q(nchildren__gt=0)
-            )
+            has_children = Parent.objects.filter(parent=OuterRef("pk"))
+            queryset = queryset.filter(Q(alive=True) | Exists(has_children))
         return queryset